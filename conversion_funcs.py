@@ -21,7 +21,9 @@ import os
 import sys
 import subprocess
 import tempfile
+import shutil
 import logging
+from gnss_file_tools import COPY_BUFSIZE, SCRATCH_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -58,58 +60,57 @@ def edit_rinex_header(infile, m, station, organization, user, antenna_type,
     """
     # First, check and fix the header if needed
     try:
-        with open(infile, 'r') as f:
-            lines = f.readlines()
-        
-        # Find the END OF HEADER line number
-        end_header_line = None
-        for i, line in enumerate(lines):
-            if 'END OF HEADER' in line:
-                end_header_line = i
-                break
-        # Fix header lines if needed
-        for i, line in enumerate(lines):
-            # Stop processing at end_header_line
-            if end_header_line is not None and i > end_header_line:
-                break
-            
-            # Apply receiver-specific fixes
-            if receiver_type_str:
-                # Fix NetR8 malformed REC # / TYPE / VERS line
-                if receiver_type_str == "NetR8" and "REC # / TYPE / VERS" in line:
-                    # Find position of "REC # / TYPE / VERS" in the line
-                    rec_type_vers_pos = line.find("REC # / TYPE / VERS")
-                    # If found and it's not at position 60, fix the formatting
-                    if rec_type_vers_pos != -1 and rec_type_vers_pos != 60:
-                        # Extract the data portion (first 60 characters)
-                        data_portion = line[:60]
-                        # Add "REC # / TYPE / VERS" starting at position 60 (column 61)
-                        fixed_line = data_portion + "REC # / TYPE / VERS\n"
-                        lines[i] = fixed_line
+        # Only the header is read as lines; the body, which is most of
+        # the file, is copied across unchanged in one go further down
+        with open(infile, 'rb') as f_in:
+            lines = []
+            for raw in iter(f_in.readline, b''):
+                lines.append(raw.decode('latin-1'))
+                if b'END OF HEADER' in raw:
+                    break
+
+            # Fix header lines if needed, keeping each line's own
+            # terminator so a CRLF file doesn't end up with mixed endings
+            for i, line in enumerate(lines):
+                eol = line[len(line.rstrip('\r\n')):]
+                # Apply receiver-specific fixes
+                if receiver_type_str:
+                    # Fix NetR8 malformed REC # / TYPE / VERS line
+                    if receiver_type_str == "NetR8" and "REC # / TYPE / VERS" in line:
+                        # Find position of "REC # / TYPE / VERS" in the line
+                        rec_type_vers_pos = line.find("REC # / TYPE / VERS")
+                        # If found and it's not at position 60, fix the formatting
+                        if rec_type_vers_pos != -1 and rec_type_vers_pos != 60:
+                            # Extract the data portion (first 60 characters)
+                            data_portion = line[:60]
+                            # Add "REC # / TYPE / VERS" starting at position 60 (column 61)
+                            fixed_line = data_portion + "REC # / TYPE / VERS" + eol
+                            lines[i] = fixed_line
 
-                # Fix NetR9 malformed PGM / RUN BY / DATE line
-                elif receiver_type_str == "NetR9" and 'PGM / RUN BY / DATE' in line:
-                    # Check if line is malformed (not properly formatted with 20-char fields)
-                    if len(line.strip()) > 60:  # Should be 60 chars + newline
-                        # Extract components
-                        parts = line.split()
-                        if len(parts) >= 3:
-                            pgm = parts[0][:20].ljust(20)  # First part is PGM
-                            run_by = parts[1][:20].ljust(20)  # Second part is RUN BY
-                            # Date should be in format YYYYMMDD HHMMSS UTC
-                            date_str = ' '.join(parts[2:])
-                            if len(date_str) > 20:
-                                date_str = date_str[:20]
-                            date_str = date_str.ljust(20)
+                    # Fix NetR9 malformed PGM / RUN BY / DATE line
+                    elif receiver_type_str == "NetR9" and 'PGM / RUN BY / DATE' in line:
+                        # Check if line is malformed (not properly formatted with 20-char fields)
+                        if len(line.strip()) > 60:  # Should be 60 chars + newline
+                            # Extract components
+                            parts = line.split()
+                            if len(parts) >= 3:
+                                pgm = parts[0][:20].ljust(20)  # First part is PGM
+                                run_by = parts[1][:20].ljust(20)  # Second part is RUN BY
+                                # Date should be in format YYYYMMDD HHMMSS UTC
+                                date_str = ' '.join(parts[2:])
+                                if len(date_str) > 20:
+                                    date_str = date_str[:20]
+                                date_str = date_str.ljust(20)
                             
-                            # Replace the line with properly formatted version
-                            lines[i] = f'{pgm}{run_by}{date_str}PGM / RUN BY / DATE\n'
-                        break
+                                # Replace the line with properly formatted version
+                                lines[i] = f'{pgm}{run_by}{date_str}PGM / RUN BY / DATE{eol}'
+                            break
 
-        # Write fixed content to a temporary file
-        temp_file = infile + '.fixed'
-        with open(temp_file, 'w') as f:
-            f.writelines(lines)
+            # Write fixed header and the untouched body to a temporary file
+            temp_file = infile + '.fixed'
+            with open(temp_file, 'wb') as f:
+                f.write(''.join(lines).encode('latin-1'))
+                shutil.copyfileobj(f_in, f, COPY_BUFSIZE)
         
         # Use the fixed file for teqc
         infile = temp_file
@@ -191,17 +192,28 @@ def edit_rinex_header(infile, m, station, organization, user, antenna_type,
             logger.error(f"Input file {infile} is empty")
             return False
         
-        # Run teqc and capture output
-        result = subprocess.run(args, capture_output=True, text=True)
-        
-        # Check if command was successful
-        if result.returncode != 0:
-            logger.error(f"Error running teqc: {result.stderr}")
-            return False
-            
-        # Write the output to the file
-        with open(m.daily_dnld_path, 'w') as f:
-            f.write(result.stdout)
+        # Run teqc with its output going straight to a file next to the
+        # destination, rather than holding the whole RINEX file in memory
+        teqc_out = m.daily_dnld_path + '.teqc'
+        try:
+            with open(teqc_out, 'wb') as f:
+                result = subprocess.run(args, stdout=f, stderr=subprocess.PIPE, text=True,
+                    close_fds=False)
+
+            # Check if command was successful
+            if result.returncode != 0:
+                logger.error(f"Error running teqc: {result.stderr}")
+                return False
+
+            # Move the output into place
+            os.replace(teqc_out, m.daily_dnld_path)
+        finally:
+            # Gone already if it was moved into place; otherwise don't
+            # leave it in the download directory
+            try:
+                os.remove(teqc_out)
+            except OSError:
+                pass
             
         # Verify output file was created and has content
         if not os.path.exists(m.daily_dnld_path):
@@ -234,39 +246,48 @@ def edit_rinex_header(infile, m, station, organization, user, antenna_type,
 
 def convert_netrs(infile, outfile, user=None):
     """Convert Trimble .T00 or .T02 file to RINEX format"""
-    tmpfile = tempfile.NamedTemporaryFile(suffix='.tgd',delete=False)
-    # convert .T00/.T02 file into intermediate .tgd file
-    args = ['/usr/local/bin/runpkr00', '-g', '-d', '-v',
-        infile, tmpfile.name]
+    tmpfile = tempfile.NamedTemporaryFile(suffix='.tgd', dir=SCRATCH_DIR,
+        delete=False)
+    # runpkr00 only writes its intermediate .tgd output to a named
+    # file, which teqc then reads back by name
+    tmpfile.close()
     try:
-        subprocess.run(args, \
-            stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
-    except Exception as e:
-        logger.error(f"Couldn't run runpkr00, error: {e}")
-        return
-    tmpfile.flush()
-    tmpfile.seek(0)
-   
-    # convert tgd to RINEX
-    with open(outfile,'w') as f:
-        # Build teqc command with basic options
-        args = [
-            '/usr/local/bin/teqc',
-            '+C2',
-            '-R'
-        ]
-        
-        # Add input file
-        args.append(tmpfile.name)
-        
+        # convert .T00/.T02 file into intermediate .tgd file
+        args = ['/usr/local/bin/runpkr00', '-g', '-d', '-v',
+            infile, tmpfile.name]
+        # close_fds=False lets subprocess start the tools with posix_spawn
+        # rather than fork+exec; our own descriptors are non-inheritable,
+        # so nothing extra leaks to them
         try:
-            subprocess.run(args, stdout = f, stderr = subprocess.DEVNULL)
+            subprocess.run(args, \
+                stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL,
+                close_fds=False)
         except Exception as e:
-            logger.error(f"Couldn't run teqc, error: {e}")
+            logger.error(f"Couldn't run runpkr00, error: {e}")
             return
-    s = outfile.split('/')
-    s = s[len(s)-2] + '/' + s[len(s)-1]
-    size = os.path.getsize(outfile)
-    tmpfile.close()
-    os.unlink(tmpfile.name)
-    return True 
+       
+        # convert tgd to RINEX
+        with open(outfile,'w') as f:
+            # Build teqc command with basic options
+            args = [
+                '/usr/local/bin/teqc',
+                '+C2',
+                '-R'
+            ]
+            
+            # Add input file
+            args.append(tmpfile.name)
+            
+            try:
+                subprocess.run(args, stdout = f, stderr = subprocess.DEVNULL,
+                    close_fds=False)
+            except Exception as e:
+                logger.error(f"Couldn't run teqc, error: {e}")
+                return
+        return True
+    finally:
+        # remove the .tgd file whether or not the conversion worked
+        try:
+            os.unlink(tmpfile.name)
+        except OSError:
+            pass
@@ -28,6 +28,7 @@ import argparse
 
 # Import the edit_rinex_header function from conversion_funcs
 from conversion_funcs import edit_rinex_header
+from gnss_file_tools import SCRATCH_DIR
 
 def convert_trimble_to_rinex(infile, antenna_type=None):
     """Convert Trimble .T00/.T02/.T04 file to RINEX format.
@@ -55,17 +56,18 @@ def convert_trimble_to_rinex(infile, antenna_type=None):
     outfile = os.path.splitext(infile)[0] + '.obs'
     
     # Create temporary file for intermediate conversion
-    tmpfile = tempfile.NamedTemporaryFile(suffix='.tgd', delete=False)
+    tmpfile = tempfile.NamedTemporaryFile(suffix='.tgd', dir=SCRATCH_DIR, delete=False)
     
     try:
         # Convert .T00/.T02/.T04 file into intermediate .tgd file
+        # (close_fds=False lets subprocess use posix_spawn)
         args = ['/usr/local/bin/runpkr00', '-g', '-d', '-v', infile, tmpfile.name]
-        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=False)
         
         # Convert tgd to RINEX
         with open(outfile, 'w') as f:
             args = ['/usr/local/bin/teqc', '+C2', '-R', tmpfile.name]
-            subprocess.run(args, stdout=f, stderr=subprocess.DEVNULL)
+            subprocess.run(args, stdout=f, stderr=subprocess.DEVNULL, close_fds=False)
             
         # Verify output file was created and has content
         if not os.path.exists(outfile):
@@ -23,17 +23,148 @@ import tempfile
 import datetime as dt
 from ftplib import FTP
 from ftplib import all_errors as ftp_errors
+from ftplib import error_perm, error_temp
 import socket
 import re
 from enum import Enum
 import zipfile
 import shutil
 import logging
-from gnss_file_tools import format_filesize
+import json
+import time
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from gnss_file_tools import format_filesize, COPY_BUFSIZE, SCRATCH_DIR
 from conversion_funcs import convert_netrs, edit_rinex_header
 
 logger = logging.getLogger(__name__)
 
+# Record of files already fetched by download_all_new_files,
+# kept in the measurement directory
+MANIFEST_FILE = ".ftp_manifest.json"
+
+# Where per-receiver discovery results are cached between runs
+CACHE_BASE_DIR = "~/.cache/gnss_ftp_tools"
+
+# How long an identified receiver type is trusted, in seconds
+RECEIVER_TYPE_TTL = 24 * 3600
+
+# Receiver types identified during this run: {fqdn: (ReceiverType, time)}
+receiver_type_cache = {}
+
+# Receive buffer requested for FTP data sockets
+FTP_RCVBUF = 1 << 20
+
+# Buffer used when reading FTP data connections
+FTP_BUFSIZE = 1 << 20
+
+# Zipped RINEX downloads up to this size are kept in memory rather
+# than written to a temporary file, since only zipfile reads them back
+DOWNLOAD_SPOOL_MAX = 64 << 20
+
+# NetRS downloads are written to SCRATCH_DIR only while it has at least
+# this much free, since tmpfs is carved out of memory
+SCRATCH_MIN_FREE = 256 << 20
+
+# Large files may be fetched as several byte ranges in parallel, each
+# over a login of its own. Receivers' embedded FTP servers allow few
+# sessions, so by default (and unless --ftp_streams asks for more) a
+# file is fetched over the one session.
+FTP_STREAMS = 1
+FTP_MULTISTREAM_MIN_SIZE = 4 << 20
+
+# download_all_new_files fetches up to this many files at once, each
+# over its own connection, and converts up to CONVERT_PARALLEL_FILES of
+# them at once (runpkr00 and teqc are separate processes, so threads
+# are enough to keep every core busy)
+FTP_PARALLEL_FILES = 4
+CONVERT_PARALLEL_FILES = os.cpu_count() or 1
+
+# Filename patterns, compiled once since they're matched against every
+# file in a receiver listing
+MOSAIC_FILE_RE = re.compile(r'.*?(\d{3})0\.(\d{2})o')
+NETR9_FILE_RE = re.compile(r'(\d{8})\d{4}A\.RINEX\.2\.11\.zip$')
+NETRS_FILE_RE = re.compile(r'(\d{8})\d{4}a\.T00$')
+RINEX_OBS_RE = re.compile(r'\.\d{2}[Oo]$')
+
+# Receiver addresses looked up once by resolve_receiver, keyed by name
+resolved_hosts = {}
+
+
+def resolve_receiver(fqdn):
+    """
+    Look up the receiver's address once, so the many FTP connections made
+    in a run connect to it directly rather than each doing a DNS lookup.
+    If the lookup fails, connections fall back to using the name.
+    """
+    try:
+        info = socket.getaddrinfo(fqdn, None, type=socket.SOCK_STREAM)
+    except OSError as e:
+        logger.debug(f"Couldn't look up {fqdn} in advance: {e}")
+        return
+    resolved_hosts[fqdn] = info[0][4][0]
+
+
+class TunedFTP(FTP):
+    """FTP client that tunes each data socket before transfer.
+
+    Disables Nagle's algorithm and requests a larger receive buffer,
+    which cuts per-file latency on the many small files receivers serve.
+    Nagle is disabled on the control connection too, since listing a
+    receiver sends many short commands (CWD, SIZE, NLST) back to back.
+    A receiver looked up by resolve_receiver is connected to by address.
+    """
+    def connect(self, host='', *args, **kwargs):
+        welcome = super().connect(resolved_hosts.get(host, host), *args, **kwargs)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError as e:
+            logger.debug(f"Couldn't tune FTP control socket: {e}")
+        return welcome
+
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = super().ntransfercmd(cmd, rest)
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, FTP_RCVBUF)
+        except OSError as e:
+            logger.debug(f"Couldn't tune FTP data socket: {e}")
+        return conn, size
+
+
+def fast_retrbinary(ftp, cmd, dest_file, blocksize=FTP_BUFSIZE):
+    """
+    Retrieve a file in binary mode, reading straight into a reusable buffer.
+
+    Equivalent to ftp.retrbinary(cmd, dest_file.write) but avoids allocating
+    a new bytes object for every chunk received, and counts the bytes as
+    they arrive so callers needn't stat the file afterwards.
+
+    Args:
+        ftp (FTP): Connected FTP session
+        cmd (str): Transfer command, e.g. "RETR filename"
+        dest_file: Binary file object to write the data to
+        blocksize (int): Size of the receive buffer in bytes
+
+    Returns:
+        tuple: (response, size) where response is the server's final
+        response, as returned by retrbinary, and size is the number of
+        bytes received
+    """
+    ftp.voidcmd("TYPE I")
+    buf = bytearray(blocksize)
+    view = memoryview(buf)
+    size = 0
+    with ftp.transfercmd(cmd) as conn:
+        while True:
+            n = conn.recv_into(buf)
+            if not n:
+                break
+            dest_file.write(view[:n])
+            size += n
+    return ftp.voidresp(), size
+
+
 class FTPConnection:
     def __init__(self, fqdn, timeout=30):
         self.fqdn = fqdn
@@ -42,7 +173,7 @@ class FTPConnection:
 
     def __enter__(self):
         try:
-            self.ftp = FTP(self.fqdn, "anonymous", timeout=self.timeout)
+            self.ftp = TunedFTP(self.fqdn, "anonymous", timeout=self.timeout)
             return self.ftp
         except socket.gaierror as e:
             logger.error(f"Could not resolve hostname '{self.fqdn}': {e}")
@@ -80,13 +211,141 @@ def with_ftp_connection(fqdn, operation, timeout=30):
     try:
         with FTPConnection(fqdn, timeout) as ftp:
             return operation(ftp)
-    except (socket.gaierror, socket.timeout, ConnectionRefusedError, ftp_errors) as e:
+    except (socket.gaierror, socket.timeout, ConnectionRefusedError) + ftp_errors as e:
         return None
     except Exception as e:
         logger.error(f"Unexpected error during FTP operation: {e}")
         return None
 
 
+def fetch_range(fqdn, remote_path, offset, length, dest_fd, timeout=30):
+    """
+    Download one byte range of a remote file over its own FTP connection.
+
+    Args:
+        fqdn (str): The FTP server hostname
+        remote_path (str): Absolute path of the file on the server
+        offset (int): First byte of the range
+        length (int): Number of bytes in the range
+        dest_fd (int): Descriptor of the local file to write the range
+            into, at the same offset; safe to share between threads
+        timeout (int): Connection timeout in seconds
+
+    Returns:
+        bool: True if the whole range was received
+    """
+    remaining = length
+    try:
+        with FTPConnection(fqdn, timeout) as ftp:
+            ftp.voidcmd("TYPE I")
+            buf = bytearray(FTP_BUFSIZE)
+            view = memoryview(buf)
+            position = offset
+            with ftp.transfercmd(f"RETR {remote_path}", rest=offset) as conn:
+                while remaining > 0:
+                    n = conn.recv_into(buf, min(remaining, FTP_BUFSIZE))
+                    if not n:
+                        break
+                    os.pwrite(dest_fd, view[:n], position)
+                    position += n
+                    remaining -= n
+            # Unless this is the last range, the data connection was closed
+            # before the server had sent the whole file, so the reply may
+            # be 426 or 451 rather than 226
+            try:
+                ftp.voidresp()
+            except error_temp as e:
+                if str(e)[:3] not in ("426", "451"):
+                    raise
+                logger.debug(f"Range {offset}+{length} of {remote_path} cut short as intended: {e}")
+            # Some servers follow the 426 with a 226 as well; rather than
+            # wait to see, or take that 226 as the answer to QUIT, drop
+            # the session without QUIT
+            ftp.close()
+    except Exception as e:
+        logger.debug(f"Range {offset}+{length} of {remote_path} failed: {e}")
+        return False
+    return remaining == 0
+
+
+def multistream_download(fqdn, remote_path, size, dest_file, streams=FTP_STREAMS):
+    """
+    Download a file as several byte ranges fetched in parallel.
+
+    Args:
+        fqdn (str): The FTP server hostname
+        remote_path (str): Absolute path of the file on the server
+        size (int): Size of the remote file in bytes
+        dest_file: Open temporary file to assemble the download in
+        streams (int): Number of parallel connections
+
+    Returns:
+        bool: True if every range was downloaded
+    """
+    # Make sure there is a real file (downloads may be spooled in memory),
+    # then pre-size it so each worker can write its range in place
+    if hasattr(dest_file, "rollover"):
+        dest_file.rollover()
+    dest_file.flush()
+    dest_fd = dest_file.fileno()
+    os.ftruncate(dest_fd, size)
+
+    chunk = -(-size // streams)
+    ranges = [(offset, min(chunk, size - offset))
+              for offset in range(0, size, chunk)]
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        results = pool.map(
+            lambda r: fetch_range(fqdn, remote_path, r[0], r[1], dest_fd),
+            ranges)
+        return all(results)
+
+
+def retrieve_file(ftp, fqdn, remote_file, dest_file, streams=None):
+    """
+    Download a file from the current directory into dest_file.
+
+    The size is asked for first, so an empty or missing file costs no
+    data connection. If streams (by default FTP_STREAMS) is more than
+    one, files of at least FTP_MULTISTREAM_MIN_SIZE bytes are split
+    across that many parallel connections using REST; if that fails, or
+    the server doesn't report the size, the file is fetched over this
+    session.
+
+    Returns:
+        int: Number of bytes downloaded
+    """
+    try:
+        ftp.voidcmd("TYPE I")
+        size = ftp.size(remote_file)
+    except error_perm as e:
+        # 550 means the file isn't there (yet), so RETR would fail too;
+        # anything else is a server that doesn't do SIZE
+        if str(e).startswith("550"):
+            logger.debug(f"{remote_file} is not available on the receiver: {e}")
+            return 0
+        size = None
+    except ftp_errors:
+        size = None
+
+    # Nothing to transfer; the caller treats an empty file as no data
+    if size == 0:
+        logger.debug(f"{remote_file} is empty on the receiver, not downloading")
+        return 0
+
+    streams = streams or FTP_STREAMS
+    if size and streams > 1 and size >= FTP_MULTISTREAM_MIN_SIZE:
+        remote_path = posixpath.join(ftp.pwd(), remote_file)
+        logger.debug(f"Fetching {remote_file} over {streams} connections")
+        if multistream_download(fqdn, remote_path, size, dest_file, streams):
+            return size
+        logger.warning(f"Parallel download of {remote_file} failed, retrying on one connection")
+        dest_file.seek(0)
+        dest_file.truncate()
+
+    response, size = fast_retrbinary(ftp, f"RETR {remote_file}", dest_file)
+    return size
+
+
 class ReceiverType(Enum):
     NETRS = "NetRS"
     NETR8 = "NetR8"
@@ -102,7 +361,7 @@ def parse_directory_listing(ftp, path):
         current_dir = ftp.pwd()
         ftp.cwd(path)
         dir_contents = []
-        ftp.retrlines("LIST", lambda x: dir_contents.append(x))
+        ftp.retrlines("LIST", dir_contents.append)
         
         dirs = []
         for line in dir_contents:
@@ -119,6 +378,27 @@ def parse_directory_listing(ftp, path):
         return []
 
 
+def list_names(ftp):
+    """
+    Return the names in the current directory.
+
+    Uses NLST, which sends just the names, rather than a LIST listing
+    that has to be parsed; some servers answer NLST on an empty
+    directory with an error, so LIST is used if NLST fails.
+    """
+    try:
+        return [posixpath.basename(name) for name in ftp.nlst()]
+    except ftp_errors:
+        dir_contents = []
+        ftp.retrlines("LIST", dir_contents.append)
+        names = []
+        for line in dir_contents:
+            parts = line.split()
+            if len(parts) >= 9:  # Standard Unix-like listing format
+                names.append(" ".join(parts[8:]))
+        return names
+
+
 def get_target_files(remote_files, receiver_type):
     """Get target files based on receiver type"""
     if receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
@@ -153,7 +433,7 @@ def extract_date_from_filename(filename, receiver_type):
     try:
         if receiver_type == ReceiverType.MOSAIC:
             # Mosaic format: n8ur1570.25o -> year=2025, doy=157
-            match = re.match(r'.*?(\d{3})0\.(\d{2})o', filename)
+            match = MOSAIC_FILE_RE.match(filename)
             if match:
                 doy = int(match.group(1))
                 year = 2000 + int(match.group(2))
@@ -161,7 +441,7 @@ def extract_date_from_filename(filename, receiver_type):
         elif receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
             # NetR8/NetR9 format: netr9-1___202506160000A.RINEX.2.11.zip -> year=2025, doy=157
             # Look for 8 digits (YYYYMMDD) followed by 4 digits and A
-            match = re.search(r'(\d{8})\d{4}A\.RINEX\.2\.11\.zip$', filename)
+            match = NETR9_FILE_RE.search(filename)
             if match:
                 date_str = match.group(1)
                 year = int(date_str[:4])
@@ -176,7 +456,7 @@ def extract_date_from_filename(filename, receiver_type):
             # NetR8/NetR9/NetRS format: YYYYMMDD in filename
             # For NetRS, the format is like netrs-1202506060000a.T00
             # The date portion is at the end: YYYYMMDDHHMMa.T00
-            match = re.search(r'(\d{8})\d{4}a\.T00$', filename)
+            match = NETRS_FILE_RE.search(filename)
             if match:
                 date_str = match.group(1)
                 year = int(date_str[:4])
@@ -205,8 +485,7 @@ def check_welcome_message(ftp):
 
 def check_directory_structure(ftp):
     """Check directory structure for receiver type indicators"""
-    directories = []
-    ftp.retrlines("LIST", lambda x: directories.append(x.split()[-1]))
+    directories = list_names(ftp)
     
     if "External" in directories:
         return ReceiverType.NETR9
@@ -230,6 +509,42 @@ def identify_receiver_type(ftp):
     return ReceiverType.UNKNOWN
 
 
+def identify_receiver_type_cached(ftp, fqdn):
+    """
+    Identify receiver type, reusing a result for the same host that is
+    less than RECEIVER_TYPE_TTL seconds old.
+
+    Results are kept in memory for this run and on disk between runs, so
+    the directory listing probe is only needed about once a day.
+    """
+    now = time.time()
+    cached = receiver_type_cache.get(fqdn)
+    if cached and now - cached[1] < RECEIVER_TYPE_TTL:
+        return cached[0]
+
+    cache_file = os.path.join(get_cache_dir(fqdn), "receiver_type")
+    try:
+        saved_at = os.path.getmtime(cache_file)
+        if now - saved_at < RECEIVER_TYPE_TTL:
+            with open(cache_file, "r") as f:
+                receiver_type = ReceiverType(f.read().strip())
+            receiver_type_cache[fqdn] = (receiver_type, saved_at)
+            return receiver_type
+    except (OSError, ValueError):
+        pass
+
+    receiver_type = identify_receiver_type(ftp)
+    if receiver_type != ReceiverType.UNKNOWN:
+        receiver_type_cache[fqdn] = (receiver_type, now)
+        try:
+            os.makedirs(get_cache_dir(fqdn), exist_ok=True)
+            with open(cache_file, "w") as f:
+                f.write(receiver_type.value + "\n")
+        except OSError as e:
+            logger.debug(f"Couldn't save receiver type cache: {e}")
+    return receiver_type
+
+
 def mosaic_get_data_dirs(ftp, m=None):
     """Get all data directories for Mosaic receiver"""
     root_dirs = parse_directory_listing(ftp, "/")
@@ -318,13 +633,135 @@ def netrs_get_data_dirs(ftp):
     return date_dirs
 
 
+def get_cache_dir(fqdn):
+    """Return the per-receiver cache directory"""
+    return os.path.join(os.path.expanduser(CACHE_BASE_DIR), fqdn)
+
+
+def load_mosaic_yydoy_base(fqdn):
+    """Return the cached Mosaic directory holding YYdoy dirs, or None"""
+    cache_file = os.path.join(get_cache_dir(fqdn), "yydoy_base")
+    try:
+        with open(cache_file, "r") as f:
+            base = f.read().strip()
+        return base or None
+    except OSError:
+        return None
+
+
+def save_mosaic_yydoy_base(fqdn, base):
+    """Remember the Mosaic directory holding YYdoy dirs for the next run"""
+    cache_dir = get_cache_dir(fqdn)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, "yydoy_base"), "w") as f:
+            f.write(base + "\n")
+    except OSError as e:
+        logger.debug(f"Couldn't save Mosaic directory cache: {e}")
+
+
+def create_download_file(receiver_type, suffix, dest_dir=None, spool=True):
+    """
+    Create the temporary file a receiver file is downloaded into.
+
+    NetRS and Mosaic downloads are handed to external programs by name,
+    so they need a real file. NetR8/NetR9 zips are only read back through
+    zipfile, so they are spooled in memory and never touch the disk
+    unless they are unusually large; with spool False, because enough
+    are already held in memory, they go straight to a file on disk.
+    Mosaic files are already RINEX and
+    are moved into dest_dir once processed, so if given they're written
+    there to begin with, making the move a rename rather than a copy.
+    Other downloads are scratch files, kept in tmpfs while there's room.
+    """
+    if receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
+        if not spool:
+            return tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        return tempfile.SpooledTemporaryFile(
+            max_size=DOWNLOAD_SPOOL_MAX, suffix=suffix)
+    if receiver_type == ReceiverType.MOSAIC and dest_dir:
+        return tempfile.NamedTemporaryFile(
+            suffix=suffix, prefix=".dnld_", dir=dest_dir, delete=False)
+    scratch_dir = SCRATCH_DIR
+    try:
+        if scratch_dir and shutil.disk_usage(scratch_dir).free < SCRATCH_MIN_FREE:
+            scratch_dir = None
+    except OSError:
+        scratch_dir = None
+    return tempfile.NamedTemporaryFile(suffix=suffix, dir=scratch_dir, delete=False)
+
+
+def download_file_size(dnld_file):
+    """Return the size of a file created by create_download_file"""
+    return dnld_file.seek(0, os.SEEK_END)
+
+
+def discard_download_file(dnld_file):
+    """Close and delete a file created by create_download_file"""
+    name = getattr(dnld_file, "name", None)
+    try:
+        dnld_file.close()
+    except Exception:
+        pass
+    if isinstance(name, str):
+        # Already gone if it was moved into place
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+def fetch_file(fqdn, remote_path, receiver_type, ftp=None, timeout=30,
+        dest_dir=None, spool=True):
+    """
+    Download a whole file into a new download file.
+
+    Args:
+        fqdn (str): The FTP server hostname
+        remote_path (str): Absolute path of the file on the server
+        receiver_type (ReceiverType): Decides what kind of file to create
+        ftp: Session to use; if None, a connection of its own is opened,
+            so several files can be fetched in parallel
+        timeout (int): Connection timeout in seconds
+        dest_dir (str): Where the file will end up (see create_download_file)
+        spool (bool): Whether a zip may be held in memory (ditto)
+
+    Returns:
+        tuple: (file object, server response, size); the file is discarded
+        and the error raised if the download fails
+    """
+    dnld_file = create_download_file(
+        receiver_type, get_temp_extension(receiver_type), dest_dir, spool)
+    try:
+        if ftp:
+            response, size = fast_retrbinary(ftp, "RETR " + remote_path, dnld_file)
+        else:
+            with FTPConnection(fqdn, timeout) as own_ftp:
+                response, size = fast_retrbinary(own_ftp, "RETR " + remote_path, dnld_file)
+        dnld_file.flush()
+    except BaseException:
+        discard_download_file(dnld_file)
+        raise
+    return dnld_file, response, size
+
+
 def download_gnss_file(
-    fqdn, gps_dirname, internal_gps_dirname, base_filename, today=False, m=None
+    fqdn, gps_dirname, internal_gps_dirname, base_filename, today=False, m=None,
+    search_roots=None, streams=None
 ):
-    """Download a file from the receiver FTP server"""
+    """Download a file from the receiver FTP server.
+
+    search_roots optionally limits the Mosaic YYdoy directory search to
+    the given top-level directories (e.g. ["/DSK1", "/SSN"]). streams,
+    if given, replaces FTP_STREAMS (see retrieve_file).
+
+    Returns (file object, remote filename, ReceiverType), or three Nones
+    on failure. The receiver type is identified over the same session as
+    the download, so callers needn't connect again to find it.
+    """
     def download_operation(ftp):
         # First identify the receiver type
-        receiver_type = identify_receiver_type(ftp)
+        receiver_type = identify_receiver_type_cached(ftp, fqdn)
         if not receiver_type:
             logger.error("Could not identify receiver type")
             return None, None, None
@@ -342,10 +779,21 @@ def download_gnss_file(
         else:  # NetRS
             temp_ext = ".T00"
 
-        dnld_file = tempfile.NamedTemporaryFile(
-            suffix=temp_ext, delete=False
-        )
+        dnld_file = create_download_file(
+            receiver_type, temp_ext, m.daily_dnld_dir if m else None)
+
+        # The file is only handed back if the download worked; otherwise
+        # it's removed rather than left in the download or scratch directory
+        try:
+            result = fetch_operation(ftp, receiver_type, dnld_file)
+        except BaseException:
+            discard_download_file(dnld_file)
+            raise
+        if result[0] is None:
+            discard_download_file(dnld_file)
+        return result
 
+    def fetch_operation(ftp, receiver_type, dnld_file):
         try:
             # Try Mosaic directory structure first (if that's what we have)
             if receiver_type == ReceiverType.MOSAIC:
@@ -358,49 +806,35 @@ def download_gnss_file(
                         # Fallback to extracting from base_filename if m is not available
                         year_short = base_filename[2:4]
 
-                    # Get list of root directories
-                    root_dirs = []
-                    try:
-                        ftp.cwd("/")
-                        dir_contents = []
-                        ftp.retrlines("LIST", lambda x: dir_contents.append(x))
-
-                        # Extract just the directory names
-                        for line in dir_contents:
-                            parts = line.split()
-                            if len(parts) >= 9 and parts[0].startswith(
-                                "d"
-                            ):  # Only directories
-                                dirname = " ".join(parts[8:])
-                                root_dirs.append(dirname)
-                    except Exception as e:
-                        logger.error(f"Error listing root directory: {str(e)}")
-
-                    # Function to recursively search for YYdoy directories
+                    # Function to recursively search for YYdoy directories.
+                    # If the listing for current_path is already known it can
+                    # be passed in as precomputed_dirs to skip the LIST.
                     def find_yydoy_dir(
-                        current_path, target_yydoy, max_depth=3, current_depth=0
+                        current_path, target_yydoy, max_depth=3, current_depth=0,
+                        precomputed_dirs=None
                     ):
                         if current_depth >= max_depth:
                             return None
 
                         try:
-                            ftp.cwd(current_path)
-
-                            # List contents
-                            dir_contents = []
-                            ftp.retrlines(
-                                "LIST", lambda x: dir_contents.append(x)
-                            )
-
-                            # Extract directories
-                            dirs = []
-                            for line in dir_contents:
-                                parts = line.split()
-                                if len(parts) >= 9 and parts[0].startswith(
-                                    "d"
-                                ):  # Only directories
-                                    dirname = " ".join(parts[8:])
-                                    dirs.append(dirname)
+                            if precomputed_dirs is not None:
+                                dirs = precomputed_dirs
+                            else:
+                                ftp.cwd(current_path)
+
+                                # List contents
+                                dir_contents = []
+                                ftp.retrlines("LIST", dir_contents.append)
+
+                                # Extract directories
+                                dirs = []
+                                for line in dir_contents:
+                                    parts = line.split()
+                                    if len(parts) >= 9 and parts[0].startswith(
+                                        "d"
+                                    ):  # Only directories
+                                        dirname = " ".join(parts[8:])
+                                        dirs.append(dirname)
 
                             # Check if any directory matches YYdoy pattern
                             for dirname in dirs:
@@ -431,13 +865,51 @@ def download_gnss_file(
                             )
                             return None
 
-                    # Search for YYdoy directory starting from each root directory
+                    # Try the base directory found on a previous run first
                     yydoy_path = None
-                    for root_dir in root_dirs:
-                        path = find_yydoy_dir(f"/{root_dir}", yydoy)
-                        if path:
-                            yydoy_path = path
-                            break
+                    cached_base = load_mosaic_yydoy_base(fqdn)
+                    if cached_base:
+                        try:
+                            ftp.cwd(f"{cached_base}/{yydoy}")
+                            yydoy_path = f"{cached_base}/{yydoy}"
+                            logger.debug(f"Using cached Mosaic data directory {cached_base}")
+                        except ftp_errors:
+                            logger.debug(f"Cached Mosaic data directory {cached_base} has no {yydoy}")
+
+                    if not yydoy_path:
+                        if search_roots:
+                            # Restrict the search to the configured roots
+                            root_dirs = []
+                            for root_dir in search_roots:
+                                root_dir = root_dir.strip("/")
+                                if root_dir and root_dir not in root_dirs:
+                                    root_dirs.append(root_dir)
+                        else:
+                            # Get list of root directories
+                            root_dirs = []
+                            try:
+                                ftp.cwd("/")
+                                dir_contents = []
+                                ftp.retrlines("LIST", dir_contents.append)
+
+                                # Extract just the directory names
+                                for line in dir_contents:
+                                    parts = line.split()
+                                    if len(parts) >= 9 and parts[0].startswith(
+                                        "d"
+                                    ):  # Only directories
+                                        dirname = " ".join(parts[8:])
+                                        root_dirs.append(dirname)
+                            except Exception as e:
+                                logger.error(f"Error listing root directory: {str(e)}")
+
+                        # Search below the root using the listing we already
+                        # have, one level deeper than each root on its own
+                        yydoy_path = find_yydoy_dir(
+                            "", yydoy, max_depth=4, precomputed_dirs=root_dirs
+                        )
+                        if yydoy_path:
+                            save_mosaic_yydoy_base(fqdn, yydoy_path.rsplit("/", 1)[0])
 
                     if not yydoy_path:
                         logger.error(f"Could not find YYdoy directory for {yydoy}")
@@ -448,22 +920,8 @@ def download_gnss_file(
                     try:
                         ftp.cwd(yydoy_path)
 
-                        dir_contents = []
-                        ftp.retrlines(
-                            "LIST", lambda x: dir_contents.append(x)
-                        )
-
-                        # Extract filenames
-                        file_list = []
-                        for line in dir_contents:
-                            parts = line.split()
-                            if (
-                                len(parts) >= 9
-                            ):  # Standard Unix-like listing format
-                                filename = " ".join(
-                                    parts[8:]
-                                )  # Filename is everything after the date/time
-                                file_list.append(filename)
+                        # Get the names in the directory
+                        file_list = list_names(ftp)
 
                         # Look for RINEX observation files which end with year+o (e.g., 25o, 24o)
                         # We'll check for both current year patterns and also common RINEX observation patterns
@@ -490,11 +948,8 @@ def download_gnss_file(
                         if remote_files:
                             remote_file = remote_files[0]
                             logger.info(f"Starting download of {remote_file}...")
-                            ftp.retrbinary(
-                                f"RETR {remote_file}", dnld_file.write
-                            )
+                            retrieve_file(ftp, fqdn, remote_file, dnld_file, streams)
                             dnld_file.flush()
-                            size = os.path.getsize(dnld_file.name)
                             return dnld_file, remote_file, receiver_type
                         else:
                             logger.error(
@@ -519,50 +974,18 @@ def download_gnss_file(
                 try:
                     ftp.cwd(internal_gps_dirname)
 
-                    # Extract just the filenames from the directory listing
-                    dir_contents = []
-                    ftp.retrlines(
-                        "LIST", lambda x: dir_contents.append(x)
-                    )
+                    # Get the names in the directory
+                    file_list = list_names(ftp)
 
-                    file_list = []
-                    for line in dir_contents:
-                        # Parse the line to extract just the filename at the end
-                        parts = line.split()
-                        if (
-                            len(parts) >= 9
-                        ):  # Standard Unix-like listing format
-                            filename = " ".join(
-                                parts[8:]
-                            )  # Filename is everything after the date/time
-                            file_list.append(filename)
-
-                    # Filter for .RINEX.2.11.zip files
-                    remote_files = [
-                        f
-                        for f in file_list
-                        if f.endswith(".RINEX.2.11.zip")
-                    ]
-
-                    # Filter files by date if we have m
-                    if m and remote_files:
-                        # Extract date from base_filename (YYYYMMDD)
-                        target_date = base_filename[:8]
-                        # Try to find a file with the correct date in its name
-                        matching_files = [
-                            f for f in remote_files if target_date in f
-                        ]
-                        if matching_files:
-                            remote_files = matching_files
-
-                    if remote_files:
-                        remote_file = remote_files[0]
+                    # Pick the file for the target date if there is one,
+                    # otherwise the first matching file
+                    remote_file = pick_dated_file(
+                        file_list, ".RINEX.2.11.zip", base_filename[:8] if m else None
+                    )
+                    if remote_file:
                         logger.info(f"Starting download of {remote_file} (converting on-the-fly)...")
-                        ftp.retrbinary(
-                            f"RETR {remote_file}", dnld_file.write
-                        )
+                        retrieve_file(ftp, fqdn, remote_file, dnld_file, streams)
                         dnld_file.flush()
-                        size = os.path.getsize(dnld_file.name)
                         return dnld_file, remote_file, receiver_type
                 except Exception as e:
                     logger.error(
@@ -573,50 +996,18 @@ def download_gnss_file(
                 try:
                     ftp.cwd("/")
 
-                    # Extract just the filenames from the directory listing
-                    dir_contents = []
-                    ftp.retrlines(
-                        "LIST", lambda x: dir_contents.append(x)
-                    )
+                    # Get the names in the directory
+                    file_list = list_names(ftp)
 
-                    file_list = []
-                    for line in dir_contents:
-                        # Parse the line to extract just the filename at the end
-                        parts = line.split()
-                        if (
-                            len(parts) >= 9
-                        ):  # Standard Unix-like listing format
-                            filename = " ".join(
-                                parts[8:]
-                            )  # Filename is everything after the date/time
-                            file_list.append(filename)
-
-                    # Filter for .RINEX.2.11.zip files
-                    remote_files = [
-                        f
-                        for f in file_list
-                        if f.endswith(".RINEX.2.11.zip")
-                    ]
-
-                    # Filter files by date if we have m
-                    if m and remote_files:
-                        # Extract date from base_filename (YYYYMMDD)
-                        target_date = base_filename[:8]
-                        # Try to find a file with the correct date in its name
-                        matching_files = [
-                            f for f in remote_files if target_date in f
-                        ]
-                        if matching_files:
-                            remote_files = matching_files
-
-                    if remote_files:
-                        remote_file = remote_files[0]
+                    # Pick the file for the target date if there is one,
+                    # otherwise the first matching file
+                    remote_file = pick_dated_file(
+                        file_list, ".RINEX.2.11.zip", base_filename[:8] if m else None
+                    )
+                    if remote_file:
                         logger.info(f"Starting download of {remote_file} (converting on-the-fly)...")
-                        ftp.retrbinary(
-                            f"RETR {remote_file}", dnld_file.write
-                        )
+                        retrieve_file(ftp, fqdn, remote_file, dnld_file, streams)
                         dnld_file.flush()
-                        size = os.path.getsize(dnld_file.name)
                         return dnld_file, remote_file, receiver_type
                 except Exception as e:
                     logger.error(f"Error accessing root directory: {str(e)}")
@@ -627,46 +1018,18 @@ def download_gnss_file(
                 try:
                     ftp.cwd(gps_dirname)
 
-                    # Extract just the filenames from the directory listing
-                    dir_contents = []
-                    ftp.retrlines(
-                        "LIST", lambda x: dir_contents.append(x)
-                    )
+                    # Get the names in the directory
+                    file_list = list_names(ftp)
 
-                    file_list = []
-                    for line in dir_contents:
-                        # Parse the line to extract just the filename at the end
-                        parts = line.split()
-                        if (
-                            len(parts) >= 9
-                        ):  # Standard Unix-like listing format
-                            filename = " ".join(
-                                parts[8:]
-                            )  # Filename is everything after the date/time
-                            file_list.append(filename)
-
-                    # Filter for T00 files
-                    remote_files = [f for f in file_list if f.endswith(".T00")]
-
-                    # Filter files by date if we have m
-                    if m and remote_files:
-                        # Extract date from base_filename (YYYYMMDD)
-                        target_date = base_filename[:8]
-                        # Try to find a file with the correct date in its name
-                        matching_files = [
-                            f for f in remote_files if target_date in f
-                        ]
-                        if matching_files:
-                            remote_files = matching_files
-
-                    if remote_files:
-                        remote_file = remote_files[0]
+                    # Pick the file for the target date if there is one,
+                    # otherwise the first matching file
+                    remote_file = pick_dated_file(
+                        file_list, ".T00", base_filename[:8] if m else None
+                    )
+                    if remote_file:
                         logger.info(f"Starting download of {remote_file}...")
-                        ftp.retrbinary(
-                            f"RETR {remote_file}", dnld_file.write
-                        )
+                        retrieve_file(ftp, fqdn, remote_file, dnld_file, streams)
                         dnld_file.flush()
-                        size = os.path.getsize(dnld_file.name)
                         return dnld_file, remote_file, receiver_type
                 except Exception as e:
                     logger.error(
@@ -680,7 +1043,76 @@ def download_gnss_file(
             logger.error(f"Error downloading file: {str(e)}")
             return None, None, None
 
-    return with_ftp_connection(fqdn, download_operation)
+    return with_ftp_connection(fqdn, download_operation) or (None, None, None)
+
+
+def pick_dated_file(names, suffix, target_date=None):
+    """
+    Return the first name ending in suffix, preferring one containing
+    target_date (YYYYMMDD), in a single pass over the listing.
+
+    Returns:
+        str or None: The chosen name, or None if nothing ends in suffix
+    """
+    first = None
+    for name in names:
+        if not name.endswith(suffix):
+            continue
+        if target_date is None or target_date in name:
+            return name
+        if first is None:
+            first = name
+    return first
+
+
+def load_manifest(manifest_path):
+    """Load the record of previously downloaded files.
+
+    Returns:
+        dict: {remote_name: {"size": int, "mtime": str}}, empty if none
+    """
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict):
+            return manifest
+        logger.warning(f"Ignoring malformed download manifest {manifest_path}")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"Couldn't read download manifest {manifest_path}: {e}")
+    return {}
+
+
+def save_manifest(manifest_path, manifest):
+    """Atomically write the record of downloaded files"""
+    tmp_path = manifest_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        logger.error(f"Couldn't write download manifest {manifest_path}: {e}")
+
+
+def get_remote_file_stat(ftp, remote_file):
+    """
+    Get size (or, failing that, modification time) of a remote file
+    without opening a data connection.
+
+    Returns:
+        dict: {"size": int or None, "mtime": str or None}, or None if
+        the server supports neither SIZE nor MDTM for this file
+    """
+    try:
+        return {"size": ftp.size(remote_file), "mtime": None}
+    except ftp_errors:
+        pass
+    try:
+        mtime = ftp.sendcmd(f"MDTM {remote_file}").split()[-1]
+        return {"size": None, "mtime": mtime}
+    except ftp_errors:
+        return None
 
 
 def download_all_new_files(fqdn, measurement_path, station, args, measurement_class):
@@ -698,14 +1130,21 @@ def download_all_new_files(fqdn, measurement_path, station, args, measurement_cl
         bool: True if successful, False otherwise
     """
     def download_operation(ftp):
-        # First identify the receiver type
-        receiver_type = identify_receiver_type(ftp)
+        # Identify the receiver once for the whole session; the directory
+        # probe lists the current directory, so start and end at root
+        ftp.cwd("/")
+        receiver_type = identify_receiver_type_cached(ftp, fqdn)
+        ftp.cwd("/")
         if not receiver_type:
             logger.error("Could not identify receiver type")
             return False
 
         logger.info(f"Identified receiver type: {receiver_type.value}")
 
+        # Load record of files fetched on previous runs
+        manifest_path = os.path.join(measurement_path, MANIFEST_FILE)
+        manifest = load_manifest(manifest_path)
+
         # Get data directories based on receiver type
         if receiver_type == ReceiverType.MOSAIC:
             data_dirs = mosaic_get_data_dirs(ftp)
@@ -732,7 +1171,13 @@ def download_all_new_files(fqdn, measurement_path, station, args, measurement_cl
                 return False
             logger.info(f"Found {len(data_dirs)} date directories")
 
-        # Process each directory
+        # List each directory, collecting the files to fetch. Files seen
+        # in the listing are noted so the manifest can forget the rest.
+        # The manifest is keyed by directory and name, since the same
+        # daily file can be on both Internal and External storage.
+        jobs = []
+        listed = set()
+        listing_complete = True
         for dir_info in data_dirs:
             try:
                 # Construct the full path based on directory type
@@ -756,22 +1201,15 @@ def download_all_new_files(fqdn, measurement_path, station, args, measurement_cl
                     logger.info(f"Processing directory: {full_path}")
                 except ftp_errors as e:
                     logger.error(f"Couldn't access directory {full_path}: {e}")
+                    listing_complete = False
                     continue
 
                 # Get list of files in current directory
-                dir_contents = []
-                ftp.retrlines("LIST", lambda x: dir_contents.append(x))
-                
-                remote_files = []
-                for line in dir_contents:
-                    # Parse the line to extract just the filename at the end
-                    parts = line.split()
-                    if len(parts) >= 9:  # Standard Unix-like listing format
-                        filename = " ".join(parts[8:])  # Filename is everything after the date/time
-                        remote_files.append(filename)
+                remote_files = list_names(ftp)
 
                 # Filter for target files based on receiver type
                 target_files = get_target_files(remote_files, receiver_type)
+                listed.update(f"{full_path}/{name}" for name in target_files)
 
                 if not target_files:
                     logger.info(f"No target files found in {full_path}")
@@ -779,9 +1217,28 @@ def download_all_new_files(fqdn, measurement_path, station, args, measurement_cl
 
                 logger.info(f"Found {len(target_files)} target files in {full_path}")
 
-                # Process each file
+                # LIST leaves the session in ASCII mode, and some servers
+                # refuse SIZE unless in binary mode
+                ftp.voidcmd("TYPE I")
+
+                # Check each file
                 for remote_file in target_files:
                     try:
+                        # Skip files we already have, unchanged, from a prior run
+                        manifest_key = f"{full_path}/{remote_file}"
+                        remote_stat = get_remote_file_stat(ftp, remote_file)
+                        # Manifests from earlier versions are keyed by bare
+                        # name; such an entry still counts, under its new key
+                        if remote_stat and manifest_key not in manifest and \
+                                manifest.get(remote_file) == remote_stat:
+                            manifest[manifest_key] = remote_stat
+                        if remote_stat and manifest.get(manifest_key) == remote_stat:
+                            logger.debug("Skipping %s, already downloaded", manifest_key)
+                            continue
+                        if remote_stat and remote_stat["size"] == 0:
+                            logger.error(f"Remote file {remote_file} is empty")
+                            continue
+
                         # Extract date information from filename
                         year, doy = extract_date_from_filename(remote_file, receiver_type)
                         if not year or not doy:
@@ -791,49 +1248,8 @@ def download_all_new_files(fqdn, measurement_path, station, args, measurement_cl
                         # Create measurement file object for this file
                         m = measurement_class(measurement_path, year, doy, station_name=station)
 
-                        # Create tempfile with appropriate extension
-                        temp_ext = get_temp_extension(receiver_type)
-                        dnld_file = tempfile.NamedTemporaryFile(suffix=temp_ext, delete=False)
-
-                        # Download the file
-                        try:
-                            logger.info(f"Starting download of {remote_file}...")
-                            response = ftp.retrbinary("RETR " + remote_file, dnld_file.write, 1024)
-                            dnld_file.flush()  # Ensure all data is written to disk
-                        except ftp_errors as e:
-                            logger.error(f"Couldn't download {remote_file}: {e}")
-                            os.remove(dnld_file.name)
-                            continue
-
-                        # Check if download was successful
-                        if not response.startswith("226"):
-                            logger.error(f"Transfer error for {remote_file}. File may be incomplete.")
-                            os.remove(dnld_file.name)
-                            continue
-
-                        # Check file size
-                        tmpsize = os.path.getsize(dnld_file.name)
-                        if tmpsize == 0:
-                            logger.error(f"Downloaded file {remote_file} was empty")
-                            os.remove(dnld_file.name)
-                            continue
-
-                        # Process the downloaded file
-                        if process_downloaded_file(dnld_file, receiver_type, station, args, m):
-                            # Get file sizes for logging
-                            zip_size = os.path.getsize(dnld_file.name)
-                            rinex_size = os.path.getsize(m.daily_dnld_path) if os.path.exists(m.daily_dnld_path) else 0
-                            
-                            if receiver_type == ReceiverType.NETRS:
-                                logger.info(f"Downloaded {remote_file} ({format_filesize(zip_size)}) and converted to RINEX ({format_filesize(rinex_size)})")
-                            elif receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
-                                logger.info(f"Downloaded {remote_file} ({format_filesize(zip_size)}) and extracted RINEX from zip ({format_filesize(rinex_size)})")
-                            else:  # MOSAIC
-                                logger.info(f"Downloaded {remote_file} ({format_filesize(zip_size)}) (RINEX file)")
-                        else:
-                            logger.error(f"Downloaded {remote_file} but processing failed")
-
-                        os.remove(dnld_file.name)
+                        remote_path = posixpath.join("/", full_path, remote_file)
+                        jobs.append((remote_path, remote_file, remote_stat, m, manifest_key))
 
                     except Exception as e:
                         logger.error(f"Error processing {remote_file}: {e}")
@@ -844,8 +1260,164 @@ def download_all_new_files(fqdn, measurement_path, station, args, measurement_cl
 
             except Exception as e:
                 logger.error(f"Error processing directory {dir_info}: {e}")
+                listing_complete = False
                 continue
 
+        # Forget files that have aged off the receiver, so the manifest
+        # doesn't grow forever; if a directory couldn't be listed, its
+        # files may still be there, so leave the manifest alone
+        if listing_complete:
+            stale = [name for name in manifest if name not in listed]
+            if stale:
+                for name in stale:
+                    del manifest[name]
+                save_manifest(manifest_path, manifest)
+                logger.debug("Dropped %d old entries from download manifest", len(stale))
+
+        if not jobs:
+            logger.info("No new files to download")
+            return True
+
+        # Fetch the files over parallel connections and convert them on
+        # a second pool as they arrive, so runpkr00/teqc runs for one file
+        # overlap the downloads of the next. Only a few files are queued
+        # ahead of the conversions, so finished downloads don't pile up.
+        queued = iter(jobs)
+        downloads = {}
+        conversions = {}
+        max_outstanding = 2 * FTP_PARALLEL_FILES + CONVERT_PARALLEL_FILES
+
+        # NetR8/NetR9 zips may be held in memory; beyond FTP_PARALLEL_FILES
+        # of them, counting both downloads allowed to spool and files
+        # awaiting conversion, further zips are written to disk so a long
+        # queue can't take up the RAM of a small host
+        spooling = set()
+
+        def may_spool():
+            held = len(spooling) + sum(1 for c in conversions.values()
+                if isinstance(c[3], tempfile.SpooledTemporaryFile))
+            return held < FTP_PARALLEL_FILES
+
+        def finish_conversion(future, remote_file, remote_stat, m, dnld_file, tmpsize,
+                manifest_key):
+            try:
+                if future.result():
+                    try:
+                        rinex_size = os.path.getsize(m.daily_dnld_path)
+                    except OSError:
+                        rinex_size = 0
+
+                    if receiver_type == ReceiverType.NETRS:
+                        logger.info(f"Downloaded {remote_file} ({format_filesize(tmpsize)}) and converted to RINEX ({format_filesize(rinex_size)})")
+                    elif receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
+                        logger.info(f"Downloaded {remote_file} ({format_filesize(tmpsize)}) and extracted RINEX from zip ({format_filesize(rinex_size)})")
+                    else:  # MOSAIC
+                        logger.info(f"Downloaded {remote_file} ({format_filesize(tmpsize)}) (RINEX file)")
+
+                    # Remember this file so later runs can skip it
+                    if remote_stat:
+                        manifest[manifest_key] = remote_stat
+                        save_manifest(manifest_path, manifest)
+                else:
+                    logger.error(f"Downloaded {remote_file} but processing failed")
+            except Exception as e:
+                logger.error(f"Error processing {remote_file}: {e}")
+            finally:
+                discard_download_file(dnld_file)
+
+        def discard_fetched(future):
+            if not future.cancelled() and future.exception() is None:
+                discard_download_file(future.result()[0])
+
+        with ThreadPoolExecutor(max_workers=FTP_PARALLEL_FILES) as pool, \
+                ThreadPoolExecutor(max_workers=CONVERT_PARALLEL_FILES) as convert_pool:
+            def submit_next():
+                job = next(queued, None)
+                if job:
+                    logger.info(f"Starting download of {job[1]}...")
+                    spool = may_spool()
+                    future = pool.submit(fetch_file, fqdn, job[0], receiver_type,
+                        dest_dir=job[3].daily_dnld_dir, spool=spool)
+                    downloads[future] = job
+                    if spool:
+                        spooling.add(future)
+                return job is not None
+
+            while len(downloads) + len(conversions) < max_outstanding and submit_next():
+                pass
+
+            try:
+                while downloads or conversions:
+                    done, _ = wait(list(downloads) + list(conversions),
+                        return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in conversions:
+                            finish_conversion(future, *conversions.pop(future))
+                            continue
+                        if future not in downloads:
+                            # A conversion already finished early below, to
+                            # make way for another file for the same day
+                            continue
+
+                        remote_path, remote_file, remote_stat, m, manifest_key = \
+                            downloads.pop(future)
+                        spooling.discard(future)
+                        try:
+                            try:
+                                dnld_file, response, tmpsize = future.result()
+                            except ftp_errors as e:
+                                # The receiver may limit how many sessions it
+                                # accepts; try again over this session
+                                logger.debug("Parallel download of %s failed (%s), retrying", remote_file, e)
+                                try:
+                                    dnld_file, response, tmpsize = fetch_file(
+                                        fqdn, remote_path, receiver_type, ftp,
+                                        dest_dir=m.daily_dnld_dir, spool=may_spool())
+                                except ftp_errors as e:
+                                    logger.error(f"Couldn't download {remote_file}: {e}")
+                                    continue
+
+                            # Check if download was successful
+                            if not response.startswith("226"):
+                                logger.error(f"Transfer error for {remote_file}. File may be incomplete.")
+                                discard_download_file(dnld_file)
+                                continue
+
+                            # Check file size
+                            if tmpsize == 0:
+                                logger.error(f"Downloaded file {remote_file} was empty")
+                                discard_download_file(dnld_file)
+                                continue
+
+                            # Two files for the same day write the same RINEX
+                            # file, so let an earlier one finish first
+                            for other in [f for f, c in conversions.items()
+                                    if c[2].daily_dnld_path == m.daily_dnld_path]:
+                                finish_conversion(other, *conversions.pop(other))
+
+                            # Process the downloaded file
+                            conversions[convert_pool.submit(process_downloaded_file,
+                                dnld_file, receiver_type, station, args, m)] = \
+                                (remote_file, remote_stat, m, dnld_file, tmpsize, manifest_key)
+
+                        except Exception as e:
+                            logger.error(f"Error processing {remote_file}: {e}")
+                            continue
+
+                    while len(downloads) + len(conversions) < max_outstanding and submit_next():
+                        pass
+            except BaseException:
+                # If the run is aborted, cancel downloads that haven't
+                # started and discard the files of the rest as they
+                # finish, rather than leaving them in the scratch directory
+                for future in downloads:
+                    future.cancel()
+                    future.add_done_callback(discard_fetched)
+                for future, conversion in conversions.items():
+                    future.add_done_callback(
+                        lambda _, dnld_file=conversion[3]: discard_download_file(dnld_file))
+                raise
+
         return True
 
     return with_ftp_connection(fqdn, download_operation)
@@ -855,7 +1427,7 @@ def process_downloaded_file(
     downloaded_file, receiver_type, station, args, m
 ):
     """Process a downloaded file based on receiver type"""
-    logger.debug(f"Processing downloaded file: {downloaded_file.name} for receiver type {receiver_type.value}")
+    logger.debug("Processing downloaded file for receiver type %s", receiver_type.value)
 
     try:
         if receiver_type == ReceiverType.NETRS:
@@ -879,9 +1451,9 @@ def process_downloaded_file(
                     args.antenna_number,
                     receiver_type.value
                 ):
-                    if os.path.exists(m.daily_dnld_path):
+                    if logger.isEnabledFor(logging.DEBUG) and os.path.exists(m.daily_dnld_path):
                         size = os.path.getsize(m.daily_dnld_path)
-                        logger.debug(f"Extracted RINEX file {os.path.basename(m.daily_dnld_path)} ({format_filesize(size)})")
+                        logger.debug("Extracted RINEX file %s (%s)", os.path.basename(m.daily_dnld_path), format_filesize(size))
                     return True
                 return False
             return False
@@ -889,33 +1461,35 @@ def process_downloaded_file(
         elif receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
             try:
                 # For NetR8/NetR9, extract RINEX file from zip
-                with zipfile.ZipFile(downloaded_file.name, "r") as zip_ref:
+                downloaded_file.seek(0)
+                with zipfile.ZipFile(downloaded_file, "r") as zip_ref:
                     # List contents for debugging
-                    logger.debug("Zip contents: " + str(zip_ref.namelist()))
+                    logger.debug("Zip contents: %s", zip_ref.namelist())
 
                     # Find the RINEX observation file
                     # Look for files ending with two digits + O/o (e.g., .25O, .26O, .25o, .26o)
                     rinex_files = []
                     for f in zip_ref.namelist():
                         # Check for two digits followed by O or o (e.g., .25O, .26O, .25o, .26o)
-                        if re.search(r'\.\d{2}[Oo]$', f):
+                        if RINEX_OBS_RE.search(f):
                             rinex_files.append(f)
                     
                     if not rinex_files:
                         logger.error("No RINEX observation files found in zip")
                         return False
 
-                    logger.debug(f"Found RINEX files: {rinex_files}")
-                    logger.debug(f"Extracting observation file to {m.daily_dnld_path}")
-                    zip_ref.extract(rinex_files[0], os.path.dirname(m.daily_dnld_path))
-                    os.rename(
-                        os.path.join(os.path.dirname(m.daily_dnld_path), rinex_files[0]),
-                        m.daily_dnld_path,
-                    )
+                    logger.debug("Found RINEX files: %s", rinex_files)
+                    logger.debug("Extracting observation file to %s", m.daily_dnld_path)
+                    # Stream the member straight to its final name
+                    os.makedirs(os.path.dirname(m.daily_dnld_path), exist_ok=True)
+                    with zip_ref.open(rinex_files[0]) as f_in:
+                        with open(m.daily_dnld_path, "wb") as f_out:
+                            shutil.copyfileobj(f_in, f_out, COPY_BUFSIZE)
 
                     if os.path.exists(m.daily_dnld_path):
-                        size = os.path.getsize(m.daily_dnld_path)
-                        logger.debug(f"Extracted RINEX file {os.path.basename(m.daily_dnld_path)} ({format_filesize(size)})")
+                        if logger.isEnabledFor(logging.DEBUG):
+                            size = os.path.getsize(m.daily_dnld_path)
+                            logger.debug("Extracted RINEX file %s (%s)", os.path.basename(m.daily_dnld_path), format_filesize(size))
                         # Edit RINEX header with station metadata
                         return edit_rinex_header(
                             m.daily_dnld_path,
@@ -943,12 +1517,16 @@ def process_downloaded_file(
 
         elif receiver_type == ReceiverType.MOSAIC:
             try:
-                # For Mosaic, just copy the RINEX file
-                shutil.copy2(downloaded_file.name, m.daily_dnld_path)
+                # For Mosaic the download is already RINEX; move it into
+                # place (a rename when on the same filesystem, otherwise
+                # an in-kernel copy)
+                downloaded_file.close()
+                shutil.move(downloaded_file.name, m.daily_dnld_path)
 
                 if os.path.exists(m.daily_dnld_path):
-                    size = os.path.getsize(m.daily_dnld_path)
-                    logger.debug(f"Copied Mosaic RINEX observation file to {m.daily_dnld_path} ({format_filesize(size)})")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        size = os.path.getsize(m.daily_dnld_path)
+                        logger.debug("Copied Mosaic RINEX observation file to %s (%s)", m.daily_dnld_path, format_filesize(size))
                     # Edit RINEX header with station metadata
                     return edit_rinex_header(
                         m.daily_dnld_path,
@@ -21,20 +21,14 @@
 import os
 import sys
 import subprocess
-import tempfile
 import argparse
 import datetime as dt
-from ftplib import FTP
-from ftplib import all_errors as ftp_errors
-import paramiko
 import shutil
-import zipfile
-import glob
-import re  # Add regex import
+import tarfile
 import socket
-import gzip
 import logging
-import stat
+import functools
+import heapq
 
 # Configure logging
 def setup_logging():
@@ -60,7 +54,7 @@ def setup_logging():
         system_handler.setFormatter(formatter)
         handlers.append(system_handler)
         logger = logging.getLogger(__name__)
-        logger.info(f"Logging to system log: {system_log}")
+        logger.info("Logging to system log: %s", system_log)
     except (PermissionError, OSError) as e:
         # If system log fails, try user log
         try:
@@ -70,11 +64,11 @@ def setup_logging():
             user_handler.setFormatter(formatter)
             handlers.append(user_handler)
             logger = logging.getLogger(__name__)
-            logger.info(f"System log access denied, logging to user log: {user_log}")
+            logger.info("System log access denied, logging to user log: %s", user_log)
         except Exception as e:
             # If both fail, just use console
             logger = logging.getLogger(__name__)
-            logger.warning(f"Could not set up file logging: {e}")
+            logger.warning("Could not set up file logging: %s", e)
             logger.warning("Logging to console only")
     
     # Always add console handler
@@ -93,16 +87,28 @@ def setup_logging():
 # Set up logging
 logger = setup_logging()
 
+# Use the fastest gzip available for compressing processed files:
+# pigz (parallel), then ISA-L's igzip, then the standard library
+try:
+    from isal import igzip as gzip_impl
+except ImportError:
+    import gzip as gzip_impl
+
 # This points to where the modules live
 MODULES_DIR = "/usr/local/lib/gnss_ftp"
 if MODULES_DIR not in sys.path:
     sys.path.insert(0, MODULES_DIR)
 
-from gnsscal import *
-from gnss_file_tools import *
-from ftp_funcs import download_gnss_file, download_all_new_files, identify_receiver_type, process_downloaded_file, ReceiverType
-from sftp_funcs import get_host_key, upload_to_sftp
-from conversion_funcs import convert_netrs
+from gnss_file_tools import (MeasurementFilesBase, format_filesize, count_dir_entries,
+    file_count_suffix, parse_dms_coordinates, parse_natural_dms_coordinates, is_compressed_file,
+    COPY_BUFSIZE, PIGZ)
+from ftp_funcs import download_gnss_file, download_all_new_files, process_downloaded_file, ReceiverType, download_file_size, discard_download_file, resolve_receiver
+# sftp_funcs is imported only when uploading, as paramiko is slow to load
+
+@functools.lru_cache(maxsize=None)
+def daily_rinex_name(m_name, doy_num, year_num):
+    """RINEX 2 daily observation file name, e.g. hs000010.25o"""
+    return f"{m_name.lower()}{doy_num:03d}0.{year_num % 100:02d}o"
 
 class TECMeasurementFiles(MeasurementFilesBase):
     """Class for TEC application with different directory structure"""
@@ -126,66 +132,78 @@ class TECMeasurementFiles(MeasurementFilesBase):
             os.makedirs(self.m_path, exist_ok=True)
             os.makedirs(self.processed_dir, exist_ok=True)
         except Exception as e:
-            print("Couldn't create directory:", e)
-            print("Exiting...")
+            logger.error("Couldn't create directory: %s", e)
+            logger.error("Exiting...")
             sys.exit()
 
     def calc_path_names(self):
         """Override path calculation for TEC application to use simpler directory structure"""
         # Calculate daily download file paths
-        self.dnld_base = self.m_path + "download/" 
+        self.dnld_base = f"{self.m_path}download/"
         
         # For today's file, use today's GPS day of week
         if self.today:
-            self.daily_dnld_file = self.m_week_name + "_" + \
-                self.today_gps_dow_str + ".obs.partial"
+            self.daily_dnld_file = \
+                f"{self.m_week_name}_{self.today_gps_dow_str}.obs.partial"
         else:
             # New file naming format: hsXXDOY0.YYo (no underscore)
-            self.daily_dnld_file = self.m_name.lower() + str(self.doy_num).zfill(3) + "0." + \
-                str(self.year_num)[-2:] + "o"
+            self.daily_dnld_file = daily_rinex_name(
+                self.m_name, self.doy_num, self.year_num)
+            
+        # Receiver file name stem, YYYYMMDD0000; today's partial file
+        # is named from the day after
+        if self.today:
+            tomorrow = dt.datetime(self.year_num, 1, 1) + \
+                dt.timedelta(days=self.doy_num)
+            self.base_filename = tomorrow.strftime("%Y%m%d") + "0000"
+        else:
+            self.base_filename = \
+                f"{self.yyyy_str}{self.mm_str}{self.dd_str}0000"
             
         self.daily_dnld_dir = self.dnld_base  # Changed to use base directory
         self.daily_dnld_path = self.daily_dnld_dir + self.daily_dnld_file
 
         # Add processed directory path
-        self.processed_dir = self.m_path + "processed/"
+        self.processed_dir = f"{self.m_path}processed/"
 
-        # Count files if directory exists
-        try:
-            self.num_files = len(glob.glob(self.daily_dnld_dir + '/*', recursive=False))
-        except:
-            self.num_files = 0
-
-        # Calculate daily zip name
-        self.daily_dnld_zip = self.m_week_name
-        if self.num_files == 7:
-            self.daily_dnld_zip += "_daily.zip"
-        else:
-            if self.num_files == 1:
-                self.daily_dnld_zip += \
-                    "_" + str(self.num_files) + "_file_daily.zip"
-            else:
-                self.daily_dnld_zip += \
-                    "_" + str(self.num_files) + "_files_daily.zip"
-        self.daily_dnld_zip_path = self.dnld_base + self.daily_dnld_zip
-        
-        # Calculate weekly rinex file paths
-        self.weekly_rinex_file = self.m_name + "__" + self.gps_week_str
-        if self.num_files == 7:
-            self.weekly_rinex_file += "_weekly.obs"
-        else:
-            if self.num_files == 1:
-                self.weekly_rinex_file += \
-                    "_" + str(self.num_files) + "_file_weekly.obs"
-            else:
-                self.weekly_rinex_file += \
-                    "_" + str(self.num_files) + "_files_weekly.obs"
+        # Weekly rinex directory; the daily zip and weekly rinex names
+        # are properties below
+        self.weekly_rinex_dir = f"{self.m_path}weekly/"
+
+    # The daily zip and weekly rinex names depend on how many files are
+    # in the download directory. They aren't used when fetching files, so
+    # they're worked out only on request rather than counting the growing
+    # directory for every file --all_new creates an object for.
+    @property
+    def daily_dnld_zip(self):
+        return self.m_week_name + file_count_suffix(self.num_files, "daily.zip")
+
+    @property
+    def daily_dnld_zip_path(self):
+        return self.dnld_base + self.daily_dnld_zip
+
+    @property
+    def weekly_rinex_file(self):
+        return f"{self.m_name}__{self.gps_week_str}" + \
+            file_count_suffix(self.num_files, "weekly.obs")
+
+    @property
+    def weekly_rinex_path(self):
+        return self.weekly_rinex_dir + self.weekly_rinex_file
+
+    @property
+    def weekly_rinex_zip(self):
+        return self.weekly_rinex_file + ".zip"
 
-        self.weekly_rinex_dir = self.m_path + "weekly/"
-        self.weekly_rinex_path = self.weekly_rinex_dir + self.weekly_rinex_file
-        self.weekly_rinex_zip = self.weekly_rinex_file + ".zip"
-        self.weekly_rinex_zip_path = \
-            self.weekly_rinex_dir + self.weekly_rinex_zip
+    @property
+    def weekly_rinex_zip_path(self):
+        return self.weekly_rinex_dir + self.weekly_rinex_zip
+
+    @functools.cached_property
+    def num_files(self):
+        """Number of files in the download directory, counted once, the
+        first time a name that depends on it is asked for"""
+        return count_dir_entries(self.daily_dnld_dir)
 
 def options_get_netrs_ftp():
     parser = argparse.ArgumentParser(description='Get Trimble NetRS FTP file')
@@ -212,10 +230,10 @@ def options_get_netrs_ftp():
         type=int,required=False,default=0,
         help="End day of year to process")
     parser.add_argument('-a','--all_new',
-        action='store_true',required=False,default=0,
+        action=argparse.BooleanOptionalAction,required=False,default=False,
         help="Download all new RINEX files")
     parser.add_argument('-t','--today',
-        action='store_true',required=False,default=0,
+        action=argparse.BooleanOptionalAction,required=False,default=False,
         help="Get today's file (may be partial)")
     parser.add_argument('--organization',
         help='Organization/agency name (required)',
@@ -245,6 +263,21 @@ def options_get_netrs_ftp():
     parser.add_argument('--sftp_pass',
         type=str,required=False,
         help="SFTP password")
+    parser.add_argument('--sftp_window_size',
+        type=int,required=False,
+        help="SSH window size in bytes for SFTP uploads (default 2 MiB)")
+    parser.add_argument('--sftp_block_size',
+        type=int,required=False,
+        help="Size in bytes of each SFTP write (default 32768)")
+    parser.add_argument('--gzip_level',
+        type=int,choices=range(1, 10),required=False,metavar='{1-9}',
+        help="gzip level for uploaded files (default 9; lower is faster but larger)")
+    parser.add_argument('--ftp_streams',
+        type=int,required=False,
+        help="Parallel FTP connections to fetch a large file over (default 1)")
+    parser.add_argument('--mosaic_search_roots',
+        type=str,nargs='+',required=False,
+        help="Top-level Mosaic directories to search for YYdoy data (e.g. /DSK1 /SSN)")
 
     args = parser.parse_args()
 
@@ -264,14 +297,14 @@ def options_get_netrs_ftp():
                 # Decimal degrees: lat lon height
                 lat, lon, height = map(float, llh_parts)
                 args.station_llh = f"{lat} {lon} {height}"
-                logger.debug(f"Detected decimal degrees: {args.station_llh}")
+                logger.debug("Detected decimal degrees: %s", args.station_llh)
             elif len(llh_parts) == 7:
                 # DMS: lat_deg lat_min lat_sec lon_deg lon_min lon_sec height
                 result = parse_dms_coordinates(args.station_llh)
                 if result:
                     lat, lon, height = result
                     args.station_llh = f"{lat} {lon} {height}"
-                    logger.debug(f"Converted DMS to decimal degrees: {args.station_llh}")
+                    logger.debug("Converted DMS to decimal degrees: %s", args.station_llh)
                 else:
                     raise ValueError("Invalid DMS format.")
             elif len(llh_parts) == 9:
@@ -280,13 +313,13 @@ def options_get_netrs_ftp():
                 if result:
                     lat, lon, height = result
                     args.station_llh = f"{lat} {lon} {height}"
-                    logger.debug(f"Converted natural DMS to decimal degrees: {args.station_llh}")
+                    logger.debug("Converted natural DMS to decimal degrees: %s", args.station_llh)
                 else:
                     raise ValueError("Invalid natural DMS format.")
             else:
                 raise ValueError("Unrecognized station_llh format. Please provide decimal degrees, DMS, or DMS with direction.")
         except Exception as e:
-            logger.error(f"Error parsing --station_llh: {e}")
+            logger.error("Error parsing --station_llh: %s", e)
             sys.exit(1)
 
     return args
@@ -304,65 +337,98 @@ def check_disk_space(path, min_free_mb=512):
         free_space = shutil.disk_usage(path).free / (1024**2)
         
         if free_space < min_free_mb:
-            print(f"Warning: Low disk space ({free_space:.0f}MB free)")
-            print("Purging oldest processed files...")
+            logger.warning("Low disk space (%.0fMB free)", free_space)
+            logger.info("Purging oldest processed files...")
             
-            # Get list of processed files sorted by modification time
+            # Get list of processed files ordered by modification time,
+            # in one directory scan; a heap, since usually only the
+            # oldest few are needed and the rest never need sorting
             processed_dir = os.path.join(path, "processed")
-            files = [(f, os.path.getmtime(os.path.join(processed_dir, f))) 
-                    for f in os.listdir(processed_dir) 
-                    if os.path.isfile(os.path.join(processed_dir, f))]
-            files.sort(key=lambda x: x[1])  # Sort by modification time
+            files = []
+            with os.scandir(processed_dir) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        st = entry.stat()
+                        files.append((st.st_mtime, entry.name, entry.path, st))
+            heapq.heapify(files)
             
-            # Remove oldest files until we have enough space
-            for file, _ in files:
-                file_path = os.path.join(processed_dir, file)
+            # Remove oldest files until we have enough space, counting
+            # the space removed rather than asking the filesystem each
+            # time; st_blocks is what the file actually occupied on disk
+            freed_mb = 0
+            while files:
+                _, file, file_path, st = heapq.heappop(files)
                 try:
                     os.remove(file_path)
-                    print(f"Removed old file: {file}")
-                    free_space = shutil.disk_usage(path).free / (1024**2)
-                    if free_space >= min_free_mb:
+                    logger.debug("Removed old file: %s", file)
+                    freed_mb += st.st_blocks * 512 / (1024**2)
+                    if free_space + freed_mb >= min_free_mb:
                         break
                 except Exception as e:
-                    print(f"Error removing {file}: {str(e)}")
+                    logger.error("Error removing %s: %s", file, e)
             
-            print(f"Current free space: {free_space:.0f}MB")
+            free_space = shutil.disk_usage(path).free / (1024**2)
+            logger.info("Current free space: %.0fMB", free_space)
             
     except Exception as e:
-        print(f"Error checking disk space: {str(e)}")
+        logger.error("Error checking disk space: %s", e)
 
 def zip_processed_files(measurement_path):
-    """Zip files in the processed directory"""
+    """Bundle uncompressed files in the processed directory into one .tar.gz"""
+    tmp_path = None
     try:
         processed_dir = os.path.join(measurement_path, "processed")
         if not os.path.exists(processed_dir):
             return
             
-        # Get list of unzipped files
-        files = [f for f in os.listdir(processed_dir) 
-                if os.path.isfile(os.path.join(processed_dir, f)) 
-                and not f.endswith('.zip')]
+        # Get list of uncompressed files, sorted so that files from the
+        # same station sit together and compress against each other
+        with os.scandir(processed_dir) as it:
+            files = sorted(entry.name for entry in it
+                    if entry.is_file() and not entry.name.startswith('.')
+                    and not is_compressed_file(entry.name))
         
         if not files:
             return
             
-        # Create zip file with same name as original file
+        stamp = dt.datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        tar_name = f"processed_{stamp}.tar.gz"
+        tar_path = os.path.join(processed_dir, tar_name)
+        # Hidden while being written so it isn't mistaken for a data file
+        tmp_path = os.path.join(processed_dir, f".{tar_name}.tmp")
+        
+        logger.debug("Creating archive: %s", tar_name)
+        with open(tmp_path, 'wb') as f_out:
+            if PIGZ:
+                pigz = subprocess.Popen([PIGZ, '-p', str(os.cpu_count() or 1)],
+                    stdin=subprocess.PIPE, stdout=f_out)
+                gz_out = pigz.stdin
+            else:
+                pigz = None
+                gz_out = gzip_impl.open(f_out, 'wb')
+            try:
+                with tarfile.open(fileobj=gz_out, mode='w|',
+                        copybufsize=COPY_BUFSIZE) as tar:
+                    for file in files:
+                        tar.add(os.path.join(processed_dir, file), arcname=file)
+                        logger.debug("Added %s to archive", file)
+            finally:
+                gz_out.close()
+                if pigz and pigz.wait() != 0:
+                    raise RuntimeError(f"pigz exited with status {pigz.returncode}")
+        os.replace(tmp_path, tar_path)
+        tmp_path = None
+        
+        # Remove original files only once the archive is complete
         for file in files:
-            file_path = os.path.join(processed_dir, file)
-            zip_name = file + '.zip'
-            zip_path = os.path.join(processed_dir, zip_name)
+            os.remove(os.path.join(processed_dir, file))
             
-            print(f"Creating zip archive: {zip_name}")
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                zipf.write(file_path, file)
-                # Remove original file after zipping
-                os.remove(file_path)
-                print(f"Added {file} to archive")
-                
-            print(f"Created zip archive: {zip_name}")
+        logger.info("Created archive %s with %s files", tar_name, len(files))
         
     except Exception as e:
-        print(f"Error creating zip archive: {str(e)}")
+        logger.error("Error compressing processed files: %s", e)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sftp_user=None, sftp_pass=None, today=False, all_new=False, args=None):
     logger.debug("Starting get_netrs_ftp.py")    # Changed to debug
@@ -370,8 +436,9 @@ def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sf
     
     if all_new:
         logger.info("Downloading all new RINEX files")
-        # Create initial MeasurementFiles object to get current date info
-        m = TECMeasurementFiles(measurement_path, 0, 0, station_name=station)  # This will use yesterday's date
+        # Create the download and processed directories up front, so the
+        # upload and zip steps find them even if nothing new is fetched
+        TECMeasurementFiles(measurement_path, 0, 0, station_name=station)
         
         # Use the new module to download all new files
         if not download_all_new_files(fqdn, measurement_path, station, args, TECMeasurementFiles):
@@ -381,7 +448,11 @@ def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sf
         # If SFTP parameters are provided, upload all downloaded files
         if sftp_host and sftp_user and sftp_pass:
             logger.info("Uploading files to SFTP server...")
-            upload_to_sftp(measurement_path, sftp_host, sftp_user, sftp_pass)
+            from sftp_funcs import upload_to_sftp
+            upload_to_sftp(measurement_path, sftp_host, sftp_user, sftp_pass,
+                args.sftp_window_size if args else None,
+                args.sftp_block_size if args else None,
+                args.gzip_level if args else None)
         else:
             logger.debug("Skipping SFTP upload - server details not provided")
         
@@ -397,7 +468,7 @@ def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sf
     # Create TECMeasurementFiles object with the provided year and doy
     m = TECMeasurementFiles(measurement_path, year, doy, today, station)
 
-    logger.info(f"Processing day {m.doy_num} of {m.year_num}, day {m.gps_dow_str} of GPS week: {m.gps_week_str}")
+    logger.info("Processing day %s of %s, day %s of GPS week: %s", m.doy_num, m.year_num, m.gps_dow_str, m.gps_week_str)
     
     if today:
         logger.info("Getting today's file (may be partial)")
@@ -405,8 +476,8 @@ def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sf
         # don't try to download a future date!
         if m.gps_days_num > m.today_gps_days_num:
             logger.error("Trying to download future day!")
-            logger.error(f"GPS week: {m.gps_week_str}, day of week: {m.gps_dow_str}")
-            logger.error(f"Today is: {m.today_gps_week_str} {m.today_gps_dow_str}")
+            logger.error("GPS week: %s, day of week: %s", m.gps_week_str, m.gps_dow_str)
+            logger.error("Today is: %s %s", m.today_gps_week_str, m.today_gps_dow_str)
             sys.exit()
     
     # Use the date components from the TECMeasurementFiles object
@@ -414,56 +485,60 @@ def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sf
     gps_dirname = m.yyyy_str + m.mm_str + "/"
     internal_gps_dirname = "Internal/" + gps_dirname
     
-    # For today's file, we need to use tomorrow's date in the filename
-    if today:
-        # Get tomorrow's date components
-        tomorrow = dt.datetime(m.year_num, 1, 1) + dt.timedelta(days=m.doy_num)
-        base_filename = tomorrow.strftime("%Y%m%d") + "0000"
-    else:
-        base_filename = m.yyyy_str + m.mm_str + m.dd_str + "0000"
-    
     # Use the new module to download the file
-    dnld_file, full_filename, receiver_type = download_gnss_file(fqdn, gps_dirname, internal_gps_dirname, base_filename, today, m)
+    search_roots = args.mosaic_search_roots if args else None
+    streams = args.ftp_streams if args else None
+    dnld_file, full_filename, receiver_type = download_gnss_file(fqdn, gps_dirname, internal_gps_dirname, m.base_filename, today, m, search_roots, streams)
     
     if not dnld_file or not full_filename or not receiver_type:
         logger.error("Failed to download file or identify receiver type")
         return
 
-    # was there any data downloaded?
-    tmpsize = os.path.getsize(dnld_file.name)
-    if tmpsize > 0:
-        if process_downloaded_file(dnld_file, receiver_type, station, args, m):
-            if receiver_type == ReceiverType.NETRS:
-                logger.info(f"Downloaded {full_filename} and converted to RINEX")
-            elif receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
-                # Get the size of the extracted RINEX file
-                if os.path.exists(m.daily_dnld_path):
-                    rinex_size = os.path.getsize(m.daily_dnld_path)
-                    logger.info(f"Downloaded {full_filename} ({format_filesize(tmpsize)}) and extracted RINEX ({format_filesize(rinex_size)})")
+    # The download is removed however processing ends, so a failed
+    # conversion doesn't leave it in the download or scratch directory
+    try:
+        # was there any data downloaded?
+        tmpsize = download_file_size(dnld_file)
+        if tmpsize > 0:
+            if process_downloaded_file(dnld_file, receiver_type, station, args, m):
+                if receiver_type == ReceiverType.NETRS:
+                    logger.info("Downloaded %s and converted to RINEX", full_filename)
+                elif receiver_type in [ReceiverType.NETR8, ReceiverType.NETR9]:
+                    # Get the size of the extracted RINEX file
+                    try:
+                        rinex_size = os.path.getsize(m.daily_dnld_path)
+                        logger.info("Downloaded %s (%s) and extracted RINEX (%s)", full_filename, format_filesize(tmpsize), format_filesize(rinex_size))
+                    except OSError:
+                        logger.info("Downloaded %s (%s) and extracted RINEX", full_filename, format_filesize(tmpsize))
+                else:  # MOSAIC
+                    logger.info("Downloaded %s (RINEX file)", full_filename)
+                # One stat both checks the output exists and gives its size
+                try:
+                    size = os.path.getsize(m.daily_dnld_path)
+                except OSError:
+                    logger.error("Expected output file not found at %s", m.daily_dnld_path)
                 else:
-                    logger.info(f"Downloaded {full_filename} ({format_filesize(tmpsize)}) and extracted RINEX")
-            else:  # MOSAIC
-                logger.info(f"Downloaded {full_filename} (RINEX file)")
-            s = m.daily_dnld_path.split('/')
-            s = s[len(s)-2] + '/' + s[len(s)-1]
-            if os.path.exists(m.daily_dnld_path):
-                size = os.path.getsize(m.daily_dnld_path)
-                logger.debug(f"Saved as {s} ({format_filesize(size)})")
+                    if logger.isEnabledFor(logging.DEBUG):
+                        # Show the file with its directory, e.g. download/hs011000.25o
+                        logger.debug("Saved as %s/%s (%s)",
+                            os.path.basename(m.daily_dnld_dir.rstrip('/')),
+                            m.daily_dnld_file, format_filesize(size))
             else:
-                logger.error(f"Expected output file not found at {m.daily_dnld_path}")
+                logger.error("Downloaded %s but couldn't convert to RINEX!", full_filename)
         else:
-            logger.error(f"Downloaded {full_filename} but couldn't convert to RINEX!")
-    else:
-        os.remove(dnld_file.name)
-        logger.error("Downloaded file was empty. Exiting.")
-        return
-
-    os.remove(dnld_file.name)
+            logger.error("Downloaded file was empty. Exiting.")
+            return
+    finally:
+        discard_download_file(dnld_file)
 
     # If SFTP parameters are provided, upload files
     if sftp_host and sftp_user and sftp_pass:
         logger.info("Uploading files to SFTP server...")
-        upload_to_sftp(measurement_path, sftp_host, sftp_user, sftp_pass)
+        from sftp_funcs import upload_to_sftp
+        upload_to_sftp(measurement_path, sftp_host, sftp_user, sftp_pass,
+            args.sftp_window_size if args else None,
+            args.sftp_block_size if args else None,
+            args.gzip_level if args else None)
     else:
         logger.debug("Skipping SFTP upload - server details not provided")
 
@@ -481,17 +556,15 @@ def get_netrs_ftp(measurement_path, fqdn, station, year, doy, sftp_host=None, sf
 if __name__ == '__main__':
     args = options_get_netrs_ftp()
     
-    # Create a temporary MeasurementFiles object to get dates
-    temp_m = MeasurementFilesBase(args.measurement_path, 0, 0)
-    
-    # If year and doy are not specified, calculate the appropriate date
+    # If year and doy are not specified, use yesterday's date; a today
+    # file is named from the day after this, so that holds for both
     if args.year == 0 and args.day_of_year == 0:
-        if args.today:
-            args.year = temp_m.year_num
-            args.day_of_year = temp_m.doy_num
-        else:
-            args.year = temp_m.yesterday_year_num
-            args.day_of_year = temp_m.yesterday_doy_num
+        yesterday = dt.datetime.utcnow() - dt.timedelta(days=1)
+        args.year = yesterday.year
+        args.day_of_year = yesterday.timetuple().tm_yday
+
+    # Look the receiver up once; a run connects to it many times
+    resolve_receiver(args.fqdn)
     
     get_netrs_ftp(args.measurement_path, \
         args.fqdn, args.station, args.year, args.day_of_year,
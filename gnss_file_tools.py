@@ -20,15 +20,36 @@ import sys
 import time
 import shutil
 import errno
+import re
 import glob
 import random
 import zipfile
-from pprint import pprint
 from gnsscal import *
 from datetime import datetime, date, timedelta, timezone
 from decimal import Decimal
 from tempfile import NamedTemporaryFile
 
+# Buffer size used when copying or compressing file bodies; RINEX
+# files run to tens of MB so a large buffer saves many small calls
+COPY_BUFSIZE = 1 << 20
+
+# Files with these extensions, or Hatanaka-compressed RINEX 2 (.YYd),
+# are already compressed and gain nothing from being deflated again
+COMPRESSED_EXTENSIONS = ('.zip', '.gz', '.Z', '.crx', '.bz2', '.xz')
+HATANAKA_RE = re.compile(r'\.\d{2}[dD]$')
+
+# Work files left by an interrupted run: teqc's header-edit output
+# and half-written archives and manifests
+TEMP_EXTENSIONS = ('.teqc', '.tmp')
+
+# pigz, if installed, compresses on every core rather than just one
+PIGZ = shutil.which('pigz')
+
+# tmpfs directory for short-lived scratch files that are handed to
+# external programs by name, so they stay off the SD card; None means
+# the default temporary directory
+SCRATCH_DIR = '/dev/shm' if os.access('/dev/shm', os.W_OK) else None
+
 # NOTE: final corrections are available about 17 days after
 # the end of each gps_week (e.g., each Wednesday), so we make
 # names for current week as well as two weeks back. 
@@ -214,35 +235,16 @@ class MeasurementFilesBase:
         self.daily_dnld_path = self.daily_dnld_dir + self.daily_dnld_file
 
         # Count files if directory exists
-        try:
-            self.num_files = len(glob.glob(self.daily_dnld_dir + '/*', recursive=False))
-        except:
-            self.num_files = 0
+        self.num_files = count_dir_entries(self.daily_dnld_dir)
 
         # Calculate daily zip name
-        self.daily_dnld_zip = self.m_week_name
-        if self.num_files == 7:
-            self.daily_dnld_zip += "_daily.zip"
-        else:
-            if self.num_files == 1:
-                self.daily_dnld_zip += \
-                    "_" + str(self.num_files) + "_file_daily.zip"
-            else:
-                self.daily_dnld_zip += \
-                    "_" + str(self.num_files) + "_files_daily.zip"
+        self.daily_dnld_zip = self.m_week_name + \
+            file_count_suffix(self.num_files, "daily.zip")
         self.daily_dnld_zip_path = self.dnld_base + self.daily_dnld_zip
         
         # Calculate weekly rinex file paths
-        self.weekly_rinex_file = self.m_name + "__" + self.gps_week_str
-        if self.num_files == 7:
-            self.weekly_rinex_file += "_weekly.obs"
-        else:
-            if self.num_files == 1:
-                self.weekly_rinex_file += \
-                    "_" + str(self.num_files) + "_file_weekly.obs"
-            else:
-                self.weekly_rinex_file += \
-                    "_" + str(self.num_files) + "_files_weekly.obs"
+        self.weekly_rinex_file = self.m_name + "__" + self.gps_week_str + \
+            file_count_suffix(self.num_files, "weekly.obs")
 
         self.weekly_rinex_dir = self.m_path + "weekly/"
         self.weekly_rinex_path = self.weekly_rinex_dir + \
@@ -328,6 +330,34 @@ MeasurementFiles = NRCanMeasurementFiles
 # used elsewhere in the nrcan_tools suite
 ######################################################################
 
+# count the entries in a directory, not counting hidden ones
+# (as glob '*' would); returns 0 if the directory doesn't exist
+def count_dir_entries(path):
+    try:
+        with os.scandir(path) as it:
+            return sum(1 for entry in it if not entry.name.startswith('.'))
+    except OSError:
+        return 0
+
+# name suffix giving how many daily files a bundle holds, e.g.
+# "_daily.zip" for a full week or "_3_files_daily.zip" otherwise
+def file_count_suffix(num_files, kind):
+    if num_files == 7:
+        return "_" + kind
+    if num_files == 1:
+        return "_1_file_" + kind
+    return "_" + str(num_files) + "_files_" + kind
+
+# True if the file is already compressed (see COMPRESSED_EXTENSIONS)
+def is_compressed_file(filename):
+    return filename.endswith(COMPRESSED_EXTENSIONS) or \
+        HATANAKA_RE.search(filename) is not None
+
+# True if the file is hidden (e.g. a download in progress) or a work
+# file (see TEMP_EXTENSIONS) rather than finished data
+def is_temp_file(filename):
+    return filename.startswith('.') or filename.endswith(TEMP_EXTENSIONS)
+
 # number formatting 
 # format in exponential notation, stripping trailing zeroes
 def format_e(n):
@@ -759,6 +789,10 @@ def parse_natural_dms_coordinates(natural_string):
 
 
 if __name__ == '__main__':
+    # only needed for this test output; slow enough to import that
+    # scripts using this module shouldn't pay for it
+    from pprint import pprint
+
     # m_path, date_1, date_2
     if len(sys.argv) == 4:
         testObj = MeasurementFiles(sys.argv[1], sys.argv[2], \
@@ -22,15 +22,43 @@ import sys
 import paramiko
 import socket
 import shutil
+import subprocess
 import gzip
-import zipfile
 import logging
+import atexit
+from gnss_file_tools import COPY_BUFSIZE, PIGZ, is_temp_file
 
 # Suppress paramiko's INFO level messages
 logging.getLogger("paramiko").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+# SSH window size requested for SFTP channels
+SFTP_WINDOW_SIZE = 2 * 1024 * 1024
+
+# Size of each SFTP write (paramiko's own put() uses 32 KiB; larger
+# writes are split by paramiko and slow it down), and how many uploaded
+# files may be awaiting the server's acknowledgement at once
+SFTP_BLOCK_SIZE = 32768
+SFTP_FILES_IN_FLIGHT = 4
+
+# SSH port, and the send buffer asked for on the connection so paramiko's
+# pipelined writes aren't held back waiting for the socket to drain
+SFTP_PORT = 22
+SFTP_SNDBUF = 4 * 1024 * 1024
+
+# gzip level for uploaded files, gzip's own default. A lower level
+# (--gzip_level) compresses two to three times faster, and the uploaded
+# RINEX files come out only a percent or so bigger
+GZIP_LEVEL = 9
+
+# OpenSSH's scp, and sshpass to give it a password, if installed
+SCP = shutil.which('scp')
+SSHPASS = shutil.which('sshpass')
+
+# Sessions opened during this run: {(host, user): (SSHClient, SFTPClient)}
+sftp_sessions = {}
+
 def get_host_key(hostname):
     """Get the host key for the given hostname, accepting it if not known"""
     try:
@@ -40,7 +68,7 @@ def get_host_key(hostname):
             return host_keys[hostname]
         
         # If not found, connect and get the key
-        transport = paramiko.Transport((hostname, 22))
+        transport = paramiko.Transport((hostname, SFTP_PORT))
         transport.start_client()
         key = transport.get_remote_server_key()
         
@@ -53,101 +81,247 @@ def get_host_key(hostname):
         logger.error(f"Error getting host key: {str(e)}")
         return None
 
-def upload_to_sftp(measurement_path, sftp_host, sftp_user, sftp_pass):
-    """Upload all files from download directory to SFTP server"""
+def get_sftp_session(sftp_host, sftp_user, sftp_pass, window_size=None):
+    """Return an SFTP client for the host and user, reusing the session
+    opened earlier in this run if it is still alive. window_size, if
+    given, replaces SFTP_WINDOW_SIZE for a new session."""
+    key = (sftp_host, sftp_user)
+    cached = sftp_sessions.get(key)
+    if cached:
+        ssh, sftp = cached
+        transport = ssh.get_transport()
+        if transport and transport.is_active():
+            return sftp
+        del sftp_sessions[key]
+        ssh.close()
+
+    # Open the socket ourselves so it can be tuned before the handshake
+    sock = socket.create_connection((sftp_host, SFTP_PORT), timeout=30)
     try:
-        # Test SFTP connection first
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SFTP_SNDBUF)
+    except OSError as e:
+        logger.debug(f"Couldn't tune SFTP socket: {e}")
+
+    # Create SSH client with auto-accept of unknown hosts
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        ssh.connect(sftp_host, username=sftp_user, password=sftp_pass,
+            timeout=30, sock=sock)
+    except Exception:
+        sock.close()
+        raise
+    logger.debug("SFTP connection established")
+
+    # Larger window so the server isn't left waiting for window
+    # adjustments while we send
+    ssh.get_transport().default_window_size = window_size or SFTP_WINDOW_SIZE
+    sftp = ssh.open_sftp()
+    logger.debug("SFTP session opened")
+
+    sftp_sessions[key] = (ssh, sftp)
+    return sftp
+
+def close_sftp_sessions():
+    """Close every SFTP session opened by get_sftp_session"""
+    for ssh, sftp in sftp_sessions.values():
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(sftp_host, username=sftp_user, password=sftp_pass, timeout=30)
+            sftp.close()
             ssh.close()
-        except socket.gaierror:
-            logger.error(f"Could not resolve SFTP hostname '{sftp_host}'")
-            return
-        except socket.timeout:
-            logger.error(f"Connection to SFTP server '{sftp_host}' timed out")
-            return
-        except paramiko.AuthenticationException:
-            logger.error(f"Authentication failed for SFTP server '{sftp_host}'")
-            return
-        except paramiko.SSHException as e:
-            logger.error(f"Error connecting to SFTP server '{sftp_host}': {e}")
-            return
-        except Exception as e:
-            logger.error(f"Error connecting to SFTP server '{sftp_host}': {e}")
-            return
-        
+        except Exception:
+            pass
+    sftp_sessions.clear()
+    logger.debug("SFTP sessions closed.")
+
+atexit.register(close_sftp_sessions)
+
+def scp_upload(paths, sftp_host, sftp_user, sftp_pass, remote_dir):
+    """Copy files to the server in a single scp run.
+
+    OpenSSH's scp is much faster than paramiko, and with -s it speaks the
+    SFTP protocol so it works for chrooted SFTP-only accounts. Returns
+    False, so the caller can fall back to paramiko, if scp (or sshpass,
+    when a password is given) isn't installed or the copy fails.
+    """
+    if not SCP or (sftp_pass and not SSHPASS):
+        return False
+
+    args = [SCP, '-s', '-q', '-P', str(SFTP_PORT),
+        '-o', 'Compression=no',
+        '-o', 'StrictHostKeyChecking=accept-new',
+        '-o', 'ConnectTimeout=30']
+    env = None
+    if sftp_pass:
+        # sshpass reads the password from $SSHPASS
+        args = [SSHPASS, '-e'] + args
+        env = dict(os.environ, SSHPASS=sftp_pass)
+    else:
+        args.append('-B')
+    args += list(paths) + [f"{sftp_user}@{sftp_host}:{remote_dir}/"]
+
+    try:
+        result = subprocess.run(args, env=env, stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        logger.debug(f"Couldn't run scp: {e}")
+        return False
+    if result.returncode != 0:
+        logger.warning(f"scp upload failed, falling back to SFTP: {result.stderr.strip()}")
+        return False
+    return True
+
+def upload_to_sftp(measurement_path, sftp_host, sftp_user, sftp_pass,
+        window_size=None, block_size=None, gzip_level=None):
+    """Upload all files from download directory to SFTP server
+
+    window_size and block_size override SFTP_WINDOW_SIZE and
+    SFTP_BLOCK_SIZE when uploading through paramiko, and gzip_level
+    overrides GZIP_LEVEL.
+    """
+    gzip_level = gzip_level or GZIP_LEVEL
+    try:
         # Create processed directory if it doesn't exist
         processed_dir = os.path.join(measurement_path, "processed")
         os.makedirs(processed_dir, exist_ok=True)
         
-        # Get all files from download directory
+        # Get all files from download directory, leaving out downloads
+        # and conversions that are unfinished or were interrupted
         download_dir = os.path.join(measurement_path, "download")
-        files = os.listdir(download_dir)
+        with os.scandir(download_dir) as it:
+            files = [(entry.name, entry.path) for entry in it
+                if entry.is_file() and not is_temp_file(entry.name)]
         if not files:
             logger.warning("No files found in download directory")
             return
             
         logger.info(f"Found {len(files)} files to upload")
         
-        # Create SSH client with auto-accept of unknown hosts
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        try:
-            ssh.connect(sftp_host, username=sftp_user, password=sftp_pass)
-            logger.debug("SFTP connection established")
-            sftp = ssh.open_sftp()
-            logger.debug("SFTP session opened")
-        except Exception as e:
-            logger.error(f"Error establishing SFTP connection: {e}")
+        # Create gzipped version of each file, which is both uploaded
+        # and kept in the processed directory
+        pending = []
+        for file, local_path in files:
+            try:
+                logger.debug(f"Processing {file} for upload...")
+                gzip_path = local_path + '.gz'
+                if PIGZ:
+                    # -k keeps the original until the upload is done
+                    subprocess.run([PIGZ, f'-{gzip_level}', '-k', '-f',
+                        '-p', str(os.cpu_count() or 1), local_path],
+                        check=True, stdin=subprocess.DEVNULL)
+                else:
+                    with open(local_path, 'rb') as f_in:
+                        with gzip.open(gzip_path, 'wb', compresslevel=gzip_level) as f_out:
+                            shutil.copyfileobj(f_in, f_out, COPY_BUFSIZE)
+                pending.append((file, local_path, gzip_path))
+            except Exception as e:
+                logger.error(f"Error processing {file}: {e}")
+                continue
+
+        if not pending:
             return
-            
-        # Check uploads directory
+
         uploads_dir = "uploads"
-        try:
-            sftp.stat(uploads_dir)
-        except Exception as e:
-            logger.error(f"Error accessing uploads directory: {e}")
-            return
-        
-        # Upload each file
-        for file in files:
-            local_path = os.path.join(download_dir, file)
-            if os.path.isfile(local_path):
-                try:
-                    logger.debug(f"Processing {file} for upload...")
-                    
-                    # Create gzipped version of the file for SFTP upload
-                    gzip_path = local_path + '.gz'
-                    with open(local_path, 'rb') as f_in:
-                        with gzip.open(gzip_path, 'wb') as f_out:
-                            shutil.copyfileobj(f_in, f_out)
-                    
-                    # Upload the gzipped file
-                    remote_path = f"{uploads_dir}/{os.path.basename(gzip_path)}"
-                    logger.info(f"Uploading {os.path.basename(gzip_path)}...")
-                    sftp.put(gzip_path, remote_path)
-                    
-                    # Create zip file in processed directory
-                    zip_path = os.path.join(processed_dir, file + '.zip')
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        zipf.write(local_path, file)
-                    
-                    # Remove the original file and temporary gzip file
+
+        # Send everything with one scp run if we can; otherwise, or if
+        # that fails, upload the files one at a time over paramiko
+        if scp_upload([gzip_path for _, _, gzip_path in pending],
+                sftp_host, sftp_user, sftp_pass, uploads_dir):
+            logger.info(f"Uploaded {len(pending)} files with scp")
+            uploaded = pending
+        else:
+            uploaded = upload_with_paramiko(pending, uploads_dir,
+                sftp_host, sftp_user, sftp_pass, window_size, block_size)
+
+        for file, local_path, gzip_path in pending:
+            try:
+                if (file, local_path, gzip_path) in uploaded:
+                    # Keep the uploaded gzip in the processed directory
+                    # rather than compressing the file a second time
+                    os.replace(gzip_path, os.path.join(processed_dir, file + '.gz'))
                     os.remove(local_path)
-                    os.remove(gzip_path)
-                    
                     logger.info(f"Uploaded {file} and stored in processed directory")
-                except Exception as e:
-                    logger.error(f"Error processing {file}: {e}")
-                    continue
+                else:
+                    # A file that failed to upload is compressed afresh
+                    # on the next run
+                    os.remove(gzip_path)
+            except Exception as e:
+                logger.error(f"Error processing {file}: {e}")
+                continue
         
-        sftp.close()
-        logger.debug("SFTP session closed.")
-        ssh.close()
         logger.info("SFTP upload completed")
         
     except Exception as e:
-        logger.error(f"SFTP error: {e}") 
\ No newline at end of file
+        logger.error(f"SFTP error: {e}") 
+
+def upload_with_paramiko(pending, uploads_dir, sftp_host, sftp_user, sftp_pass,
+        window_size=None, block_size=None):
+    """Upload each (file, local_path, gzip_path) in pending over paramiko,
+    returning the entries that were uploaded"""
+    # Connect, or reuse the connection from an earlier upload
+    try:
+        sftp = get_sftp_session(sftp_host, sftp_user, sftp_pass, window_size)
+    except socket.gaierror:
+        logger.error(f"Could not resolve SFTP hostname '{sftp_host}'")
+        return []
+    except socket.timeout:
+        logger.error(f"Connection to SFTP server '{sftp_host}' timed out")
+        return []
+    except paramiko.AuthenticationException:
+        logger.error(f"Authentication failed for SFTP server '{sftp_host}'")
+        return []
+    except paramiko.SSHException as e:
+        logger.error(f"Error connecting to SFTP server '{sftp_host}': {e}")
+        return []
+    except Exception as e:
+        logger.error(f"Error connecting to SFTP server '{sftp_host}': {e}")
+        return []
+
+    # Check uploads directory
+    try:
+        sftp.stat(uploads_dir)
+    except Exception as e:
+        logger.error(f"Error accessing uploads directory: {e}")
+        return []
+
+    # Writes are pipelined, and a file is only closed, which waits for
+    # the server to acknowledge its writes, once the next few files have
+    # been sent; so the acknowledgements for one file arrive while the
+    # following files are still going out
+    uploaded = []
+    in_flight = []
+
+    def finish(entry, remote):
+        try:
+            remote.close()
+            uploaded.append(entry)
+        except Exception as e:
+            logger.error(f"Error uploading {entry[0]}: {e}")
+
+    for entry in pending:
+        file, local_path, gzip_path = entry
+        try:
+            remote_path = f"{uploads_dir}/{os.path.basename(gzip_path)}"
+            logger.info(f"Uploading {os.path.basename(gzip_path)}...")
+            remote = sftp.open(remote_path, 'wb')
+        except Exception as e:
+            logger.error(f"Error uploading {file}: {e}")
+            continue
+        try:
+            remote.set_pipelined(True)
+            with open(gzip_path, 'rb') as f_in:
+                shutil.copyfileobj(f_in, remote, block_size or SFTP_BLOCK_SIZE)
+        except Exception as e:
+            logger.error(f"Error uploading {file}: {e}")
+            try:
+                remote.close()
+            except Exception:
+                pass
+            continue
+        in_flight.append((entry, remote))
+        if len(in_flight) > SFTP_FILES_IN_FLIGHT:
+            finish(*in_flight.pop(0))
+
+    for entry, remote in in_flight:
+        finish(entry, remote)
+    return uploaded
@@ -21,6 +21,7 @@
 # does not use f vars the way the original version did.
 
 import os
+import errno
 import sys
 import shutil
 import logging
@@ -52,6 +53,11 @@ UPLOADS_DIR = "uploads"
 # List of file prefixes to ignore (first 4 characters)
 IGNORED_PREFIXES = ["hs00"]
 
+# Date patterns tried by get_doy_from_filename, in order
+STATION_DOY_RE = re.compile(r"[a-zA-Z0-9_-]+(\d{3})0\.(\d{2})o")
+YYYYMMDD_RE = re.compile(r"(\d{4})(\d{2})(\d{2})")
+YYYYDDD_RE = re.compile(r"(\d{4})(\d{3})")
+
 
 def get_doy_from_filename(filename):
     """
@@ -63,7 +69,7 @@ def get_doy_from_filename(filename):
         # This handles the format: hsXXDOY0.YYo (e.g., hs000010.25o)
         # It looks for the pattern anywhere in the filename, ignoring
         # final extensions like .gz or .Z.
-        match = re.search(r"[a-zA-Z0-9_-]+(\d{3})0\.(\d{2})o", filename)
+        match = STATION_DOY_RE.search(filename)
         if match:
             doy = int(match.group(1))
             year_yy = int(match.group(2))
@@ -73,14 +79,14 @@ def get_doy_from_filename(filename):
 
         # Use regex for YYYYMMDD to find it anywhere in the name.
         # This pattern is checked before YYYYDDD to avoid ambiguity.
-        match = re.search(r"(\d{4})(\d{2})(\d{2})", filename)
+        match = YYYYMMDD_RE.search(filename)
         if match:
             date_str = "".join(match.groups())
             date = datetime.datetime.strptime(date_str, "%Y%m%d")
             return date.year, date.timetuple().tm_yday
 
         # Use regex for YYYYDDD to find it anywhere in the name.
-        match = re.search(r"(\d{4})(\d{3})", filename)
+        match = YYYYDDD_RE.search(filename)
         if match:
             year = int(match.group(1))
             doy = int(match.group(2))
@@ -110,6 +116,15 @@ def move_file_safely(src_path, dest_dir, filename):
     temp_file = None
     temp_path = None  # Initialize to prevent NameError in except block
     try:
+        # On the same filesystem a rename is already atomic, so there's
+        # no need to copy the data through a temporary file
+        try:
+            os.rename(src_path, os.path.join(dest_dir, filename))
+            return True
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
         # Create temporary file in the destination directory
         temp_file = tempfile.NamedTemporaryFile(
             dir=dest_dir,
@@ -161,7 +176,9 @@ def process_user_directory(user_dir):
         return
 
     try:
-        files = os.listdir(uploads_path)
+        # Regular files only, typed from the directory scan itself
+        with os.scandir(uploads_path) as it:
+            files = [entry.name for entry in it if entry.is_file()]
     except Exception as e:
         logging.error("Error reading directory {}: {}".format(uploads_path, e))
         return
@@ -173,8 +190,6 @@ def process_user_directory(user_dir):
 
     for filename in files:
         src_path = os.path.join(uploads_path, filename)
-        if not os.path.isfile(src_path):
-            continue
 
         # Check if file should be ignored based on prefix
         if len(filename) >= 4:
@@ -209,11 +224,8 @@ def main():
     logging.info("Starting RINEX file sweep")
 
     try:
-        user_dirs = [
-            d
-            for d in os.listdir(SFTP_USERS_BASE_DIR)
-            if os.path.isdir(os.path.join(SFTP_USERS_BASE_DIR, d))
-        ]
+        with os.scandir(SFTP_USERS_BASE_DIR) as it:
+            user_dirs = [entry.name for entry in it if entry.is_dir()]
     except Exception as e:
         logging.error("Error reading SFTP users directory: {}".format(e))
         sys.exit(1)